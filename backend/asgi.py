@@ -13,4 +13,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
+# Lets settings.RUNNING_ASGI route the async-only views
+os.environ['DJANGO_SERVER_INTERFACE'] = 'asgi'
+
 application = get_asgi_application()
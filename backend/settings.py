@@ -103,6 +103,25 @@ DATABASES = {
     )
 }
 
+# =====================
+# CACHE
+# =====================
+# locmem is per worker: other workers see a write once their cached data
+# version expires. Set CACHE_BACKEND to FileBasedCache (with CACHE_LOCATION
+# a shared directory) to share entries and invalidations across workers.
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.environ.get("CACHE_LOCATION", "myapi-default"),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 300)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 20000)),
+        },
+    }
+}
+# How long a worker trusts its cached copy of a data version (see myapi.versions)
+DATA_VERSION_CACHE_SECONDS = int(os.environ.get("DATA_VERSION_CACHE_SECONDS", 5))
+
 # =====================
 # FIREBASE CONFIG
 # =====================
@@ -165,6 +184,130 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# =====================
+# REST FRAMEWORK
+# =====================
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "myapi.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# =====================
+# API PAGINATION
+# =====================
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", 100))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", 1000))
+
+# =====================
+# OUTBOUND HTTP (myapi.http_client)
+# =====================
+HTTP_CLIENT_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CLIENT_CONNECT_TIMEOUT", 10))
+HTTP_CLIENT_READ_TIMEOUT = float(os.environ.get("HTTP_CLIENT_READ_TIMEOUT", 60))
+HTTP_CLIENT_RETRIES = int(os.environ.get("HTTP_CLIENT_RETRIES", 3))
+HTTP_CLIENT_BACKOFF = float(os.environ.get("HTTP_CLIENT_BACKOFF", 0.5))
+# Hosts kept in the pool cache, and keep-alive connections per host
+HTTP_CLIENT_POOL_HOSTS = int(os.environ.get("HTTP_CLIENT_POOL_HOSTS", 10))
+HTTP_CLIENT_POOL_SIZE = int(os.environ.get("HTTP_CLIENT_POOL_SIZE", 20))
+# Concurrent upstream connections per async worker (ASGI download view)
+HTTP_CLIENT_ASYNC_MAX_CONNECTIONS = int(os.environ.get("HTTP_CLIENT_ASYNC_MAX_CONNECTIONS", 500))
+
+# =====================
+# REPORT DOWNLOADS
+# =====================
+# Size of each chunk relayed from the PDF store to the client
+REPORT_STREAM_CHUNK_SIZE = int(os.environ.get("REPORT_STREAM_CHUNK_SIZE", 64 * 1024))
+
+# "proxy" relays PDFs through Django, "redirect" sends a 302 to a signed
+# storage URL when possible (per request: ?delivery=redirect|proxy)
+REPORT_DELIVERY = os.environ.get("REPORT_DELIVERY", "proxy")
+REPORT_SIGNED_URL_SECONDS = int(os.environ.get("REPORT_SIGNED_URL_SECONDS", 300))
+
+# True when served by backend/asgi.py: download-report/ is then served by
+# the async view (a WSGI server would buffer its async body).
+RUNNING_ASGI = os.environ.get("DJANGO_SERVER_INTERFACE") == "asgi"
+
+# Local LRU cache of report PDFs (set PDF_CACHE_MAX_BYTES=0 to disable)
+PDF_CACHE_DIR = os.environ.get("PDF_CACHE_DIR", str(BASE_DIR / "pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.environ.get("PDF_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+PDF_CACHE_REVALIDATE_SECONDS = int(os.environ.get("PDF_CACHE_REVALIDATE_SECONDS", 300))
+
+# Single pages rendered to JPEG (/report/<id>/page/<n>.jpg), LRU-evicted
+PAGE_RENDER_CACHE_DIR = os.environ.get("PAGE_RENDER_CACHE_DIR", str(BASE_DIR / "page_cache"))
+PAGE_RENDER_CACHE_MAX_BYTES = int(os.environ.get("PAGE_RENDER_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Concurrent poppler renders per process, and distinct renders queued
+# before requests get a 503
+PAGE_RENDER_WORKERS = int(os.environ.get("PAGE_RENDER_WORKERS", 2))
+PAGE_RENDER_MAX_PENDING = int(os.environ.get("PAGE_RENDER_MAX_PENDING", 8))
+PAGE_RENDER_TIMEOUT = int(os.environ.get("PAGE_RENDER_TIMEOUT", 30))
+# Seconds a request waits for its page, PDF fetch included, before a 503
+PAGE_RENDER_WAIT_SECONDS = int(os.environ.get("PAGE_RENDER_WAIT_SECONDS", 60))
+# ?w= is rounded up to a multiple of the step and capped
+PAGE_RENDER_DEFAULT_WIDTH = int(os.environ.get("PAGE_RENDER_DEFAULT_WIDTH", 800))
+PAGE_RENDER_WIDTH_STEP = int(os.environ.get("PAGE_RENDER_WIDTH_STEP", 100))
+PAGE_RENDER_MAX_WIDTH = int(os.environ.get("PAGE_RENDER_MAX_WIDTH", 2000))
+PAGE_RENDER_QUALITY = int(os.environ.get("PAGE_RENDER_QUALITY", 80))
+PAGE_RENDER_MAX_AGE = int(os.environ.get("PAGE_RENDER_MAX_AGE", 24 * 3600))
+
+# =====================
+# HOMEPAGE FEATURED POOL
+# =====================
+# Pre-joined company/report entries kept in memory per worker
+FEATURED_POOL_SIZE = int(os.environ.get("FEATURED_POOL_SIZE", 300))
+FEATURED_POOL_REFRESH_SECONDS = int(os.environ.get("FEATURED_POOL_REFRESH_SECONDS", 600))
+
+# =====================
+# HTTP CACHING
+# =====================
+# Cache-Control max-age for read APIs; clients revalidate with the ETag after
+API_CACHE_MAX_AGE = int(os.environ.get("API_CACHE_MAX_AGE", 60))
+SITEMAP_CACHE_MAX_AGE = int(os.environ.get("SITEMAP_CACHE_MAX_AGE", 3600))
+# Rendered JSON (plain + gzip) kept per URL and data version; see myapi.payload_cache
+API_PAYLOAD_CACHE_SECONDS = int(os.environ.get("API_PAYLOAD_CACHE_SECONDS", 3600))
+# Smaller bodies are sent uncompressed
+API_GZIP_MIN_BYTES = int(os.environ.get("API_GZIP_MIN_BYTES", 1024))
+
+# =====================
+# COMPANY PAGE CACHE
+# =====================
+# Writes invalidate entries immediately; the timeout only bounds memory
+COMPANY_PAGE_CACHE_SECONDS = int(os.environ.get("COMPANY_PAGE_CACHE_SECONDS", 24 * 3600))
+# How long a miss may hold the rebuild lock before others rebuild too
+COMPANY_PAGE_LOCK_SECONDS = int(os.environ.get("COMPANY_PAGE_LOCK_SECONDS", 10))
+
+# =====================
+# TYPEAHEAD
+# =====================
+# In-memory prefix index per worker, patched on writes; fully rebuilt this often
+TYPEAHEAD_FULL_REBUILD_SECONDS = int(os.environ.get("TYPEAHEAD_FULL_REBUILD_SECONDS", 3600))
+TYPEAHEAD_MAX_RESULTS = int(os.environ.get("TYPEAHEAD_MAX_RESULTS", 10))
+
+# =====================
+# REPORT THUMBNAILS
+# =====================
+# Report.thumbnail_url gets the first width in the first format; the rest
+# are only compared by benchmark_thumbnails
+THUMBNAIL_WIDTHS = [int(w) for w in os.environ.get("THUMBNAIL_WIDTHS", "320,160,640").split(",")]
+THUMBNAIL_FORMATS = os.environ.get("THUMBNAIL_FORMATS", "jpeg,webp").split(",")
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", 80))
+# Seconds pdftoppm may spend on one page
+THUMBNAIL_RENDER_TIMEOUT = int(os.environ.get("THUMBNAIL_RENDER_TIMEOUT", 60))
+# Processes used for batches (myapi.thumbnails.render_many)
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", os.cpu_count() or 1))
+# backfill_thumbnails: bytes requested per PDF before falling back to the whole file
+THUMBNAIL_PREFIX_BYTES = int(os.environ.get("THUMBNAIL_PREFIX_BYTES", 2 * 1024 * 1024))
+
+# =====================
+# SITEMAP
+# =====================
+SITEMAP_BASE_URL = os.environ.get("SITEMAP_BASE_URL", "https://arannualreport.com")
+# Where this backend serves sitemap-*.xml, for the index; empty uses the
+# host sitemap.xml was requested on
+SITEMAP_SHARD_BASE_URL = os.environ.get("SITEMAP_SHARD_BASE_URL", "")
+# URLs per sitemap file (the protocol allows at most 50,000)
+SITEMAP_SHARD_SIZE = int(os.environ.get("SITEMAP_SHARD_SIZE", 45000))
+
 # =====================
 # DEFAULT SETTINGS
 # =====================
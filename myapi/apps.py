@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MyapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'myapi'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the write hooks)
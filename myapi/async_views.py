@@ -0,0 +1,115 @@
+"""
+Async download_report for ASGI deployments, e.g.
+
+    gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker
+
+A slow PDF host only parks a coroutine here instead of pinning a whole
+sync worker, so one worker can relay hundreds of transfers at once. It
+serves download-report/ only when backend/asgi.py is the entry point
+(RUNNING_ASGI): a WSGI server would buffer the async body instead of
+streaming it.
+
+Redirects, the PDF cache and response headers come from the same helpers
+as views.download_report; their blocking parts (URL signing, cache
+lookups and fills, file reads) run through sync_to_async. A cache fill
+downloads on the cache's own thread, once per PDF however many clients
+are waiting on it; ranges of uncached reports are relayed over httpx.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import http_client
+from .models import Report
+from .views import (
+    _fetch_upstream,
+    _pdf_cache_response,
+    _range_not_satisfiable,
+    _redirect_response,
+    _relay_response,
+    _upstream_range_headers,
+)
+
+
+async def _aread_file_range(f, start, length, chunk_size):
+    # None of this touches the database, so it need not queue behind the
+    # thread-sensitive executor
+    read = sync_to_async(f.read, thread_sensitive=False)
+    try:
+        await sync_to_async(f.seek, thread_sensitive=False)(start)
+        while length > 0:
+            chunk = await read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+async def _aiter_flight(flight):
+    # Tail an in-flight cache fill; each read may wait for the download
+    chunks = iter(flight)
+    next_chunk = sync_to_async(next, thread_sensitive=False)
+    try:
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+    finally:
+        flight.close()
+
+
+async def _astream_upstream(upstream, chunk_size):
+    try:
+        async for chunk in upstream.aiter_raw(chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        await upstream.aclose()
+
+
+async def download_report_async(request, report_id):
+    report = await Report.objects.filter(id=report_id).afirst()
+    if report is None:
+        return HttpResponse("Report not found", status=404)
+
+    pdf_url = report.pdf_url
+
+    if not pdf_url:
+        return HttpResponse("PDF URL missing", status=400)
+
+    mode = request.GET.get("mode", "view")
+
+    response = await sync_to_async(_redirect_response, thread_sensitive=False)(request, report, mode)
+    if response:
+        return response
+
+    response = await sync_to_async(_pdf_cache_response, thread_sensitive=False)(
+        request, report, mode, lambda headers: _fetch_upstream(pdf_url, headers), _aread_file_range, _aiter_flight
+    )
+    if response:
+        return response
+
+    # identity encoding keeps upstream Content-Length valid for the client
+    upstream_headers = {"Accept-Encoding": "identity", **_upstream_range_headers(request)}
+
+    client = http_client.get_async_client()
+    pdf_response = None
+    try:
+        pdf_response = await client.send(
+            client.build_request("GET", pdf_url, headers=upstream_headers),
+            stream=True,
+        )
+
+        if pdf_response.status_code == 416:
+            await pdf_response.aclose()
+            return _range_not_satisfiable(pdf_response)
+
+        pdf_response.raise_for_status()
+    except Exception as e:
+        if pdf_response is not None:
+            await pdf_response.aclose()
+        return HttpResponse(f"Error fetching PDF: {e}", status=500)
+
+    return _relay_response(
+        pdf_response, _astream_upstream(pdf_response, settings.REPORT_STREAM_CHUNK_SIZE), report, mode
+    )
@@ -0,0 +1,52 @@
+"""
+Base for the per-process structures served straight from memory
+(featured.FeaturedPool, typeahead.TypeaheadIndex).
+
+Subclasses implement refresh(), is_empty() and is_stale(). ensure_fresh()
+builds inline only when there is nothing to serve yet; otherwise a stale
+structure keeps being served while at most one background thread
+rebuilds it.
+"""
+import threading
+
+from django.db import connection
+
+
+class BackgroundRefresh:
+    def __init__(self):
+        # subclasses extend this with their own counters
+        self.metrics = {"refresh_errors": 0}
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def refresh(self):
+        raise NotImplementedError
+
+    def is_empty(self):
+        raise NotImplementedError
+
+    def is_stale(self):
+        raise NotImplementedError
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception:
+            with self._lock:
+                self.metrics["refresh_errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing = False
+            # the thread got its own DB connection; don't leak it
+            connection.close()
+
+    def ensure_fresh(self):
+        if self.is_empty():
+            # Cold start: nothing to serve yet, build inline
+            self.refresh()
+        elif self.is_stale():
+            with self._lock:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_in_background, daemon=True).start()
@@ -0,0 +1,51 @@
+"""
+ETag / Last-Modified validators for read endpoints, derived from the data
+versions in myapi.versions.
+
+A request whose If-None-Match (or If-Modified-Since) still matches is
+answered with 304 before the view runs: no query, no serialization.
+"""
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import payload_cache, versions
+
+
+def versioned(scopes, cache_payload=False, **cache_control):
+    """
+    View decorator. scopes is a list of version scopes, or a callable taking
+    the view's URL kwargs and returning one. cache_control is passed to
+    patch_cache_control() on every response. With cache_payload, rendered
+    JSON bodies are kept in myapi.payload_cache, gzipped or not.
+
+    Use method_decorator() on APIView methods.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            names = scopes(**kwargs) if callable(scopes) else scopes
+            state = versions.get_state(*names)
+
+            # weak: the same data may go out with or without gzip
+            etag = "W/" + quote_etag("-".join(str(version) for version, _ in state))
+            last_modified = max(updated for _, updated in state) or None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None and cache_payload:
+                response = payload_cache.respond(request, etag, lambda: view(request, *args, **kwargs))
+            elif response is None:
+                response = view(request, *args, **kwargs)
+
+            if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                if last_modified:
+                    response.headers.setdefault("Last-Modified", http_date(last_modified))
+                patch_cache_control(response, **cache_control)
+            return response
+
+        return wrapper
+
+    return decorator
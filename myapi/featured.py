@@ -0,0 +1,85 @@
+"""
+In-process pool of pre-joined company + report + logo entries behind the
+homepage endpoints (random-company-report/, random-logos/).
+
+Requests sample from the pool in memory. The pool is rebuilt on a
+background thread when it is older than FEATURED_POOL_REFRESH_SECONDS or
+the data version has moved; stale entries keep being served meanwhile.
+"""
+import random
+import time
+
+from django.conf import settings
+
+from . import sampling
+from .background import BackgroundRefresh
+
+
+class FeaturedPool(BackgroundRefresh):
+    def __init__(self, size, refresh_interval):
+        super().__init__()
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.entries = []
+        self.version = None
+        self.built_at = 0.0
+        self.metrics.update({"hits": 0, "refreshes": 0, "last_refresh_seconds": 0.0})
+
+    def refresh(self):
+        started = time.monotonic()
+        version = sampling.data_version()
+        entries = []
+        for comp, report in sampling.sample_company_reports(self.size):
+            entries.append({
+                "company": {
+                    "id": comp.id,
+                    "name": comp.name,
+                    "ticker": comp.ticker,
+                    "sector": comp.sector,
+                    "exchange": comp.exchange,
+                },
+                "logo": comp.logo,
+                "report": report,
+            })
+
+        with self._lock:
+            self.entries = entries
+            self.version = version
+            self.built_at = time.monotonic()
+            self.metrics["refreshes"] += 1
+            self.metrics["last_refresh_seconds"] = round(time.monotonic() - started, 4)
+
+    def is_empty(self):
+        return not self.entries
+
+    def is_stale(self):
+        if time.monotonic() - self.built_at > self.refresh_interval:
+            return True
+        return self.version != sampling.data_version()
+
+    def sample(self, k):
+        self.ensure_fresh()
+        entries = self.entries
+        with self._lock:
+            self.metrics["hits"] += 1
+        return random.sample(entries, min(k, len(entries)))
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.metrics)
+        data.update({
+            "size": len(self.entries),
+            "target_size": self.size,
+            "age_seconds": round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+        })
+        return data
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = FeaturedPool(settings.FEATURED_POOL_SIZE, settings.FEATURED_POOL_REFRESH_SECONDS)
+    return _pool
@@ -0,0 +1,116 @@
+"""
+Process-wide HTTP client for every outbound fetch (PDF store, report sites).
+
+One requests.Session per process (and retry policy) keeps a keep-alive
+connection pool per host, so repeated PDF fetches skip the TCP + TLS
+handshake. The session is
+rebuilt in the child after a fork (gunicorn --preload), never shared.
+Async views get an httpx.AsyncClient per event loop with the same limits.
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Retry policies by name; every policy gets its own session and pool.
+# "scrape" is what download_pdf_with_headers always used: report sites
+# behind bot protection answer 403 for a while before letting us in.
+RETRY_POLICIES = {
+    "default": {
+        "status_forcelist": [429, 500, 502, 503, 504],
+        "allowed_methods": ["GET", "HEAD"],
+    },
+    "scrape": {
+        "total": 5,
+        "backoff_factor": 1,
+        "status_forcelist": [403, 429, 500, 502, 503, 504],
+        "allowed_methods": ["GET"],
+    },
+}
+
+_sessions = {}
+_session_pid = None
+_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _build_session(policy):
+    options = {
+        "total": settings.HTTP_CLIENT_RETRIES,
+        "backoff_factor": settings.HTTP_CLIENT_BACKOFF,
+        **RETRY_POLICIES[policy],
+    }
+    # hand the last response back so callers can raise_for_status()
+    retries = Retry(raise_on_status=False, **options)
+    adapter = HTTPAdapter(
+        pool_connections=settings.HTTP_CLIENT_POOL_HOSTS,
+        pool_maxsize=settings.HTTP_CLIENT_POOL_SIZE,
+        max_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(policy="default"):
+    global _sessions, _session_pid
+
+    pid = os.getpid()
+    session = _sessions.get(policy) if _session_pid == pid else None
+    if session is None:
+        with _lock:
+            if _session_pid != pid:
+                _sessions = {}
+                _session_pid = pid
+            session = _sessions.get(policy)
+            if session is None:
+                session = _sessions[policy] = _build_session(policy)
+    return session
+
+
+def get(url, retry="default", **kwargs):
+    """GET through the pooled session of the named retry policy."""
+    kwargs.setdefault(
+        "timeout",
+        (settings.HTTP_CLIENT_CONNECT_TIMEOUT, settings.HTTP_CLIENT_READ_TIMEOUT),
+    )
+    return get_session(retry).get(url, **kwargs)
+
+
+def get_async_client():
+    # An AsyncClient is bound to the loop it first ran on
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.HTTP_CLIENT_READ_TIMEOUT,
+                connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_CLIENT_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_CLIENT_POOL_SIZE,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=settings.HTTP_CLIENT_RETRIES),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _reset_after_fork():
+    global _sessions, _session_pid, _lock, _async_clients
+    _sessions = {}
+    _session_pid = None
+    _lock = threading.Lock()
+    _async_clients = weakref.WeakKeyDictionary()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,126 @@
+"""
+Company logos moved out of CompName.logo.
+
+CompName.logo used to hold whole images inline as base64 (bare or as a
+data: URI). extract_all(), run by manage.py extract_logos (and, frozen,
+by migration 0012), uploads each such image to the durable media store
+(myapi.media_store) as company_logos/<sha256>.<ext> and leaves only its
+absolute URL in the row; the original value moves to InlineLogo. A logo
+whose upload fails stays inline until the next run. Saving a company
+never uploads anything, so admin and import writes do not depend on the
+store being reachable.
+"""
+import base64
+import binascii
+import hashlib
+import re
+
+from django.db import transaction
+
+from . import media_store
+from .models import CompName, InlineLogo
+
+FOLDER = "company_logos"
+
+EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/x-icon": "ico",
+}
+
+_DATA_URI = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?[^,]*;base64,(?P<data>.*)$", re.S)
+
+
+def _sniff(data):
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"\x00\x00\x01\x00"):
+        return "image/x-icon"
+    head = data[:512].lstrip().lower()
+    if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return "image/svg+xml"
+    return None
+
+
+def decode_inline(value):
+    """
+    (content type, image bytes) for an inline base64 logo, or None for
+    URLs, media paths and anything that does not decode to an image.
+    """
+    value = (value or "").strip()
+    if not value or value.startswith(("http://", "https://", "/")):
+        return None
+
+    match = _DATA_URI.match(value)
+    payload = match.group("data") if match else value
+    try:
+        data = base64.b64decode("".join(payload.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+    mime = _sniff(data)
+    if mime is None and match:
+        mime = (match.group("mime") or "").lower()
+    if mime not in EXTENSIONS or not data:
+        return None
+    return mime, data
+
+
+def store(mime, data):
+    """Upload the image under its content hash and return its absolute URL."""
+    name = f"{FOLDER}/{hashlib.sha256(data).hexdigest()}.{EXTENSIONS[mime]}"
+    return media_store.upload(name, data, mime)
+
+
+def extract_all(batch_size=200):
+    """
+    Move every inline logo to the media store, keeping the original in
+    InlineLogo. A row is rewritten only after its upload is confirmed.
+    Returns ([(ticker_norm, exchange_norm) of each company whose logo
+    changed], number of logos that could not be stored).
+    """
+    candidates = list(
+        CompName.objects.exclude(logo__isnull=True)
+        .exclude(logo="")
+        .exclude(logo__startswith="http")
+        .exclude(logo__startswith="/")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+    changed, failed = [], 0
+    for start in range(0, len(candidates), batch_size):
+        ids = candidates[start:start + batch_size]
+        rows = list(CompName.objects.filter(id__in=ids).only("id", "logo", "ticker_norm", "exchange_norm"))
+
+        updated, originals = [], []
+        for row in rows:
+            decoded = decode_inline(row.logo)
+            if not decoded:
+                continue
+            try:
+                url = store(*decoded)
+            except Exception:
+                failed += 1
+                continue
+            originals.append(InlineLogo(company_id=row.id, logo=row.logo))
+            row.logo = url
+            updated.append(row)
+            changed.append((row.ticker_norm, row.exchange_norm))
+
+        with transaction.atomic():
+            # a company re-inlined after an earlier run keeps its latest original
+            InlineLogo.objects.bulk_create(
+                originals, update_conflicts=True, unique_fields=["company"], update_fields=["logo"]
+            )
+            CompName.objects.bulk_update(updated, ["logo"])
+    return changed, failed
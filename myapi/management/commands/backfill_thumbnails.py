@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from myapi import http_client, media_store, pdf_cache, response_cache, summaries, thumbnails, versions
+from myapi.models import CompName, Report
+
+
+def _is_whole_file(content_range):
+    # "bytes 0-2097151/5423310"; an unknown length ("*") counts as partial
+    _, _, spec = (content_range or "").partition(" ")
+    span, _, total = spec.partition("/")
+    _, _, end = span.partition("-")
+    try:
+        return int(end) + 1 >= int(total)
+    except ValueError:
+        return False
+
+
+# What thumbnails.store() used to return before it moved to the media store:
+# THUMBNAIL_BASE_URL (often empty) + /thumbnails/<sha256>-<width>.<ext>,
+# served from local disk, which Render wipes
+LOCAL_THUMBNAIL_URL = r"^(https?://[^/]+)?/thumbnails/[0-9a-f]{64}-[0-9]+\.(jpg|webp)$"
+
+
+def _link_or_copy(source, path):
+    # a link survives the cache evicting its copy mid-render
+    try:
+        os.link(source, path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(source, path)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render and store thumbnails for reports whose thumbnail_url is missing "
+        "or points at the old local /thumbnails/ files"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Reports per bulk update")
+        parser.add_argument("--workers", type=int, default=None, help="Render processes (THUMBNAIL_WORKERS)")
+        parser.add_argument("--rate", type=float, default=0, help="Max PDF fetches per second (0: no limit)")
+        parser.add_argument("--start-id", type=int, default=0, help="Skip reports below this id")
+        parser.add_argument("--limit", type=int, default=None, help="Stop after this many reports")
+        parser.add_argument(
+            "--prefix-bytes", type=int, default=settings.THUMBNAIL_PREFIX_BYTES,
+            help="Fetch only this many leading bytes when the store honours Range (0: whole file)",
+        )
+
+    def _pending(self, start_id, limit):
+        # keyset walk, so rows fixed by earlier batches are never re-read
+        reports = (
+            Report.objects.filter(
+                Q(thumbnail_url__isnull=True) | Q(thumbnail_url="") | Q(thumbnail_url__regex=LOCAL_THUMBNAIL_URL)
+            )
+            .exclude(pdf_url__isnull=True)
+            .exclude(pdf_url="")
+            .order_by("id")
+        )
+        last_id, seen = start_id - 1, 0
+        while limit is None or seen < limit:
+            size = 500 if limit is None else min(500, limit - seen)
+            chunk = list(
+                reports.filter(id__gt=last_id).values("id", "pdf_url", "ticker_norm", "exchange_norm")[:size]
+            )
+            if not chunk:
+                return
+            for row in chunk:
+                self.fetched_upto = row["id"]
+                yield row
+            last_id, seen = chunk[-1]["id"], seen + len(chunk)
+
+    def _download(self, row, path, prefix_bytes):
+        """Write the report's PDF (or its first prefix_bytes) to path; True if only a prefix."""
+        cache = pdf_cache.get_cache()
+        entry = cache.lookup(cache.key_for(row["id"], row["pdf_url"])) if cache.enabled else None
+        if entry:
+            try:
+                _link_or_copy(entry.path, path)
+                return False
+            except FileNotFoundError:
+                pass  # evicted since the lookup: fetch it instead
+
+        headers = {"Accept-Encoding": "identity"}
+        if prefix_bytes:
+            headers["Range"] = f"bytes=0-{prefix_bytes - 1}"
+        with http_client.get(row["pdf_url"], headers=headers, stream=True) as response:
+            response.raise_for_status()
+            partial = response.status_code == 206 and not _is_whole_file(response.headers.get("Content-Range"))
+            with open(path, "wb") as f:
+                for chunk in response.iter_content(settings.REPORT_STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+        return partial
+
+    def _jobs(self, rows, directory, prefix_bytes):
+        # Yields (report id, local path) for render_many; throttled to --rate
+        for row in rows:
+            if self.rate:
+                delay = self.next_fetch_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.next_fetch_at = max(self.next_fetch_at, time.monotonic()) + 1 / self.rate
+
+            path = os.path.join(directory, f"{row['id']}.pdf")
+            try:
+                partial = self._download(row, path, prefix_bytes)
+            except Exception as e:
+                self._fail(row["id"], f"fetch: {e}")
+                continue
+            self.rows[row["id"]] = dict(row, partial=partial, path=path)
+            yield row["id"], path
+
+    def _fail(self, report_id, error):
+        self.failed += 1
+        self.stderr.write(f"report {report_id}: {error}")
+
+    def _render(self, jobs, workers, render_options):
+        for report_id, result, error in thumbnails.render_many(jobs, workers, render_options):
+            row = self.rows.pop(report_id)
+            os.remove(row["path"])
+            if error and row["partial"]:
+                # poppler could not place page 1 within the prefix
+                self.retry.append(row)
+            elif error:
+                self._fail(report_id, error)
+            else:
+                try:
+                    url = thumbnails.store(result[0])
+                except Exception as e:
+                    self._fail(report_id, f"store: {e}")
+                    continue
+                self.batch.append((row, url))
+                if len(self.batch) >= self.batch_size:
+                    self._flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        with transaction.atomic():
+            Report.objects.bulk_update(
+                [Report(id=row["id"], thumbnail_url=url) for row, url in self.batch], ["thumbnail_url"]
+            )
+            # bulk_update skips the save signals that keep these current
+            for company in {(row["ticker_norm"], row["exchange_norm"]) for row, _ in self.batch}:
+                summaries.refresh_company_summary(CompName, Report, *company)
+                response_cache.invalidate_company(*company)
+            versions.bump("reports")
+            versions.bump("companies")
+
+        self.done += len(self.batch)
+        self.batch = []
+
+        # Renders finish out of order: resume below anything still unresolved
+        unresolved = [*self.rows, *(row["id"] for row in self.retry), self.fetched_upto + 1]
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f"{self.done} thumbnails stored, {self.failed} failed, "
+            f"{self.done / elapsed:.2f}/s (resume with --start-id {min(unresolved)})"
+        )
+
+    def handle(self, *args, **options):
+        if not media_store.available():
+            raise CommandError("Thumbnails need a durable store: set FIREBASE_CREDENTIALS or CLOUDINARY_URL")
+
+        self.batch_size = options["batch_size"]
+        self.rate = options["rate"]
+        self.next_fetch_at = time.monotonic()
+        self.rows, self.batch, self.retry, self.done, self.failed = {}, [], [], 0, 0
+        self.fetched_upto = options["start_id"] - 1
+        self.started = time.monotonic()
+
+        workers = options["workers"] or settings.THUMBNAIL_WORKERS
+        render_options = thumbnails.primary_options()
+        pending = self._pending(options["start_id"], options["limit"])
+
+        with tempfile.TemporaryDirectory(prefix="thumbnails-") as directory:
+            self._render(self._jobs(pending, directory, options["prefix_bytes"]), workers, render_options)
+            if self.retry:
+                self.stdout.write(f"Fetching {len(self.retry)} PDFs whole: page 1 was past the first bytes")
+                retry, self.retry = self.retry, []
+                self._render(self._jobs(retry, directory, 0), workers, render_options)
+            self._flush()
+
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Stored {self.done} thumbnails ({self.failed} failed) in {elapsed:.1f}s, "
+            f"{self.done / elapsed if elapsed else 0:.2f}/s"
+        ))
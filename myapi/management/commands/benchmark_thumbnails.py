@@ -0,0 +1,51 @@
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from pdf2image import convert_from_bytes
+
+from myapi import thumbnails
+
+
+def _legacy(path):
+    # What the upload code did: default-dpi raster from bytes, then squash
+    with open(path, "rb") as f:
+        pages = convert_from_bytes(f.read(), first_page=1, last_page=1)
+    buffer = BytesIO()
+    pages[0].resize((300, 400)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = "Compare thumbnails/sec of the old convert_from_bytes + resize path and myapi.thumbnails"
+
+    def add_arguments(self, parser):
+        parser.add_argument("pdfs", nargs="+", help="Local PDF files to render")
+        parser.add_argument("--repeat", type=int, default=3, help="Passes over the files")
+        parser.add_argument("--workers", type=int, default=None, help="Pool size for the batch run")
+
+    def _report(self, label, count, seconds):
+        self.stdout.write(f"{label:<34} {count:>5} thumbnails in {seconds:7.2f}s  {count / seconds:8.2f}/s")
+
+    def handle(self, *args, **options):
+        paths = options["pdfs"] * options["repeat"]
+        render_options = thumbnails.options()
+
+        started = time.perf_counter()
+        for path in paths:
+            _legacy(path)
+        self._report("before (bytes, 200 dpi, resize)", len(paths), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for path in paths:
+            thumbnails.render(path, **render_options)
+        self._report("after, one process", len(paths), time.perf_counter() - started)
+
+        started = time.perf_counter()
+        failed = 0
+        for _, _, error in thumbnails.render_many(enumerate(paths), options["workers"], render_options):
+            failed += error is not None
+        self._report("after, process pool", len(paths), time.perf_counter() - started)
+
+        variants = len(set(render_options["widths"])) * len(render_options["formats"])
+        self.stdout.write(f"(each 'after' thumbnail is {variants} widths x formats; {failed} failed)")
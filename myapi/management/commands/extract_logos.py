@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapi import logos, media_store, response_cache, versions
+
+
+class Command(BaseCommand):
+    help = "Move inline base64 company logos to the media store (Firebase or Cloudinary)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if not media_store.available():
+            raise CommandError("No durable media store: set FIREBASE_CREDENTIALS or CLOUDINARY_URL")
+
+        changed, failed = logos.extract_all(batch_size=options["batch_size"])
+
+        # bulk_update skips the signals that would invalidate these
+        for company in changed:
+            response_cache.invalidate_company(*company)
+        if changed:
+            versions.bump("companies")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Moved {len(changed)} inline logos to the media store ({failed} failed, left inline)"
+        ))
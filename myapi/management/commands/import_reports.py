@@ -156,7 +156,7 @@
 
 
 
-# import requests
+# from myapi import http_client
 # import time
 # from io import BytesIO
 
@@ -194,7 +194,7 @@
 #         # 1️⃣ Fetch company page
 #         # --------------------------
 #         try:
-#             response = requests.get(
+#             response = http_client.get(
 #                 self.COMPANY_URL,
 #                 headers=self.HEADERS,
 #                 timeout=30
@@ -248,7 +248,7 @@
 #             thumb_public_id = None
 
 #             try:
-#                 pdf_response = requests.get(
+#                 pdf_response = http_client.get(
 #                     pdf_url,
 #                     headers=self.HEADERS,
 #                     timeout=60
@@ -348,5 +348,5 @@
 
 #         self.stdout.write("\n==============================")
 #         self.stdout.write(self.style.SUCCESS(f"✅ Success: {success}"))
-        self.stdout.write(self.style.ERROR(f"❌ Failed: {failed}"))
-        self.stdout.write("==============================\n")
+#         self.stdout.write(self.style.ERROR(f"❌ Failed: {failed}"))
+#         self.stdout.write("==============================\n")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from myapi import summaries, versions
+from myapi.models import CompName, Report
+
+
+class Command(BaseCommand):
+    help = "Recompute report count / year range / latest thumbnail for every company"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = summaries.rebuild_all(CompName, Report, batch_size=options["batch_size"])
+        versions.bump("companies")
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt summaries for {updated} companies"))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from myapi import search, versions
+
+
+class Command(BaseCommand):
+    help = "Re-index every company for /api/search/ (after bulk imports that skip save())"
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        versions.bump("search")
+        self.stdout.write(self.style.SUCCESS("✅ Rebuilt the company search index"))
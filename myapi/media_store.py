@@ -0,0 +1,98 @@
+"""
+Durable home for the images the app derives itself: company logos moved
+out of CompName.logo and rendered report thumbnails.
+
+The local disk on Render is wiped on every deploy, so files go to the
+Firebase bucket the reports live in (settings.FIREBASE_BUCKET) or else to
+Cloudinary (configured by CLOUDINARY_URL), the two stores the upload code
+has always used. upload() returns an absolute URL only once the store has
+confirmed the object; callers rewrite rows after that, never before.
+
+Names are content hashes, so an object never changes once written and is
+served with a one-year immutable Cache-Control.
+"""
+import uuid
+from io import BytesIO
+from urllib.parse import quote
+
+from django.conf import settings
+
+try:
+    import cloudinary
+    import cloudinary.uploader
+except ImportError:  # pragma: no cover - cloudinary is in requirements.txt
+    cloudinary = None
+
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+TOKEN_METADATA = "firebaseStorageDownloadTokens"
+
+
+class StoreUnavailable(Exception):
+    """No durable store is configured, or it did not confirm an upload."""
+
+
+def _bucket():
+    return getattr(settings, "FIREBASE_BUCKET", None)
+
+
+def _cloudinary_configured():
+    return cloudinary is not None and bool(cloudinary.config().cloud_name)
+
+
+def available():
+    return _bucket() is not None or _cloudinary_configured()
+
+
+def _firebase_url(bucket, name, token):
+    return (
+        f"https://firebasestorage.googleapis.com/v0/b/{bucket.name}/o/"
+        f"{quote(name, safe='')}?alt=media&token={token}"
+    )
+
+
+def _firebase_upload(bucket, name, data, content_type):
+    blob = bucket.get_blob(name)
+    if blob is None or blob.size != len(data):
+        blob = bucket.blob(name)
+        blob.metadata = {TOKEN_METADATA: str(uuid.uuid4())}
+        blob.cache_control = CACHE_CONTROL
+        blob.upload_from_string(data, content_type=content_type)
+        blob.reload()
+        if blob.size != len(data):
+            raise StoreUnavailable(f"Firebase stored {blob.size} of {len(data)} bytes for {name}")
+
+    token = (blob.metadata or {}).get(TOKEN_METADATA, "").split(",")[0]
+    if not token:
+        raise StoreUnavailable(f"Firebase object {name} has no download token")
+    return _firebase_url(bucket, name, token)
+
+
+def _cloudinary_upload(name, data):
+    folder, _, file_name = name.rpartition("/")
+    result = cloudinary.uploader.upload(
+        BytesIO(data),
+        folder=folder,
+        public_id=file_name.rsplit(".", 1)[0],
+        resource_type="image",
+        overwrite=False,
+        unique_filename=False,
+    )
+    url = result.get("secure_url")
+    if not url:
+        raise StoreUnavailable(f"Cloudinary did not return a URL for {name}")
+    return url
+
+
+def upload(name, data, content_type):
+    """
+    Store data under name ("<folder>/<content hash>.<ext>") and return its
+    absolute URL. Raises StoreUnavailable when there is nowhere durable to
+    put it; other store errors propagate.
+    """
+    bucket = _bucket()
+    if bucket is not None:
+        return _firebase_upload(bucket, name, data, content_type)
+    if _cloudinary_configured():
+        return _cloudinary_upload(name, data)
+    raise StoreUnavailable("Neither FIREBASE_CREDENTIALS nor CLOUDINARY_URL is configured")
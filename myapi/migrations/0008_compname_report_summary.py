@@ -0,0 +1,80 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+from django.db.models.functions import Upper
+
+SUMMARY_FIELDS = ["report_count", "first_report_year", "latest_report_year", "latest_thumbnail_url"]
+
+
+def rebuild_summaries(apps, schema_editor):
+    # Frozen copy of summaries.rebuild_all as of this migration: reports
+    # match companies on upper-cased ticker + exchange
+    CompName = apps.get_model("myapi", "CompName")
+    Report = apps.get_model("myapi", "Report")
+
+    stats = {}
+    grouped = (
+        Report.objects.annotate(t=Upper("ticker"), e=Upper("exchange"))
+        .values("t", "e")
+        .annotate(count=Count("id"), first=Min("year"), latest=Max("year"))
+    )
+    for row in grouped:
+        stats[(row["t"], row["e"])] = row
+
+    thumbnails = {}
+    newest_first = (
+        Report.objects.exclude(thumbnail_url__isnull=True)
+        .exclude(thumbnail_url="")
+        .annotate(t=Upper("ticker"), e=Upper("exchange"))
+        .order_by("-year")
+        .values_list("t", "e", "thumbnail_url")
+    )
+    for t, e, url in newest_first.iterator(chunk_size=5000):
+        thumbnails.setdefault((t, e), url)
+
+    batch = []
+    for comp in CompName.objects.only("id", "ticker", "exchange", *SUMMARY_FIELDS).iterator(chunk_size=1000):
+        key = (comp.ticker.upper() if comp.ticker else None, comp.exchange.upper() if comp.exchange else None)
+        row = stats.get(key, {})
+        comp.report_count = row.get("count", 0)
+        comp.first_report_year = row.get("first")
+        comp.latest_report_year = row.get("latest")
+        comp.latest_thumbnail_url = thumbnails.get(key)
+        batch.append(comp)
+
+        if len(batch) >= 1000:
+            CompName.objects.bulk_update(batch, SUMMARY_FIELDS)
+            batch = []
+
+    if batch:
+        CompName.objects.bulk_update(batch, SUMMARY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapi', '0007_compinfo_exchange_compinfo_linkedin_link_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compname',
+            name='report_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='compname',
+            name='first_report_year',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='compname',
+            name='latest_report_year',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='compname',
+            name='latest_thumbnail_url',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+    ]
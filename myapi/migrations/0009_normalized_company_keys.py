@@ -0,0 +1,116 @@
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Value
+from django.db.models.functions import Coalesce, Trim, Upper
+
+SUMMARY_FIELDS = ["report_count", "first_report_year", "latest_report_year", "latest_thumbnail_url"]
+
+
+def backfill_normalized_keys(apps, schema_editor):
+    for model_name in ("Report", "CompName", "CompInfo"):
+        apps.get_model("myapi", model_name).objects.update(
+            ticker_norm=Coalesce(Upper(Trim("ticker")), Value("")),
+            exchange_norm=Coalesce(Upper(Trim("exchange")), Value("")),
+        )
+
+
+def rebuild_summaries(apps, schema_editor):
+    # Frozen copy of summaries.rebuild_all as of this migration: reports
+    # match companies on the normalized keys backfilled above
+    CompName = apps.get_model("myapi", "CompName")
+    Report = apps.get_model("myapi", "Report")
+
+    stats = {}
+    grouped = (
+        Report.objects.values("ticker_norm", "exchange_norm")
+        .annotate(count=Count("id"), first=Min("year"), latest=Max("year"))
+        .order_by()
+    )
+    for row in grouped:
+        stats[(row["ticker_norm"], row["exchange_norm"])] = row
+
+    thumbnails = {}
+    newest_first = (
+        Report.objects.exclude(thumbnail_url__isnull=True)
+        .exclude(thumbnail_url="")
+        .order_by("-year")
+        .values_list("ticker_norm", "exchange_norm", "thumbnail_url")
+    )
+    for t, e, url in newest_first.iterator(chunk_size=5000):
+        thumbnails.setdefault((t, e), url)
+
+    batch = []
+    companies = CompName.objects.only("id", "ticker_norm", "exchange_norm", *SUMMARY_FIELDS)
+    for comp in companies.iterator(chunk_size=1000):
+        key = (comp.ticker_norm, comp.exchange_norm)
+        row = stats.get(key, {})
+        comp.report_count = row.get("count", 0)
+        comp.first_report_year = row.get("first")
+        comp.latest_report_year = row.get("latest")
+        comp.latest_thumbnail_url = thumbnails.get(key)
+        batch.append(comp)
+
+        if len(batch) >= 1000:
+            CompName.objects.bulk_update(batch, SUMMARY_FIELDS)
+            batch = []
+
+    if batch:
+        CompName.objects.bulk_update(batch, SUMMARY_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapi', '0008_compname_report_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='ticker_norm',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='exchange_norm',
+            field=models.CharField(default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='compname',
+            name='ticker_norm',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='compname',
+            name='exchange_norm',
+            field=models.CharField(default='', editable=False, max_length=50),
+        ),
+        migrations.AddField(
+            model_name='compinfo',
+            name='ticker_norm',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='compinfo',
+            name='exchange_norm',
+            field=models.CharField(default='', editable=False, max_length=50),
+        ),
+        migrations.RunPython(backfill_normalized_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['ticker_norm', 'exchange_norm', 'year'], name='report_company_year_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compname',
+            index=models.Index(fields=['ticker_norm', 'exchange_norm'], name='compname_company_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compname',
+            index=models.Index(fields=['exchange_norm'], name='compname_exchange_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='compinfo',
+            index=models.Index(fields=['ticker_norm', 'exchange_norm'], name='compinfo_company_idx'),
+        ),
+        # Recompute the 0008 summaries now that they match on normalized keys
+        migrations.RunPython(rebuild_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_company_rows(apps, schema_editor):
+    CompName = apps.get_model("myapi", "CompName")
+    Report = apps.get_model("myapi", "Report")
+    CompInfo = apps.get_model("myapi", "CompInfo")
+
+    Report.objects.update(company_id=Subquery(
+        CompName.objects.filter(
+            ticker_norm=OuterRef("ticker_norm"), exchange_norm=OuterRef("exchange_norm")
+        ).order_by("id").values("id")[:1]
+    ))
+
+    # one-to-one: the first info row per company wins
+    company_ids = {}
+    for pk, ticker_norm, exchange_norm in CompName.objects.order_by("-id").values_list(
+        "id", "ticker_norm", "exchange_norm"
+    ):
+        company_ids[(ticker_norm, exchange_norm)] = pk
+
+    linked = set()
+    for info in CompInfo.objects.order_by("pk").only("pk", "ticker_norm", "exchange_norm"):
+        company_id = company_ids.get((info.ticker_norm, info.exchange_norm))
+        if company_id is not None and company_id not in linked:
+            linked.add(company_id)
+            CompInfo.objects.filter(pk=info.pk).update(company_id=company_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapi', '0009_normalized_company_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='company',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reports', to='myapi.compname'),
+        ),
+        migrations.AddField(
+            model_name='compinfo',
+            name='company',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='info', to='myapi.compname'),
+        ),
+        migrations.RunPython(link_company_rows, migrations.RunPython.noop),
+    ]
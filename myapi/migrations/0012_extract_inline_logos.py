@@ -0,0 +1,188 @@
+import base64
+import binascii
+import hashlib
+import re
+import uuid
+from io import BytesIO
+from urllib.parse import quote
+
+from django.conf import settings
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Q
+from django.utils import timezone
+
+# Frozen copy of myapi.logos / myapi.media_store as of this migration
+
+EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+    "image/svg+xml": "svg",
+    "image/x-icon": "ico",
+}
+
+DATA_URI = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?[^,]*;base64,(?P<data>.*)$", re.S)
+
+
+def sniff(data):
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data.startswith(b"\x00\x00\x01\x00"):
+        return "image/x-icon"
+    head = data[:512].lstrip().lower()
+    if head.startswith(b"<svg") or (head.startswith(b"<?xml") and b"<svg" in head):
+        return "image/svg+xml"
+    return None
+
+
+def decode_inline(value):
+    value = (value or "").strip()
+    if not value or value.startswith(("http://", "https://", "/")):
+        return None
+
+    match = DATA_URI.match(value)
+    payload = match.group("data") if match else value
+    try:
+        data = base64.b64decode("".join(payload.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+    mime = sniff(data)
+    if mime is None and match:
+        mime = (match.group("mime") or "").lower()
+    if mime not in EXTENSIONS or not data:
+        return None
+    return mime, data
+
+
+def uploader():
+    """upload(name, data, content type) -> absolute URL, or None without a durable store."""
+    bucket = getattr(settings, "FIREBASE_BUCKET", None)
+    if bucket is not None:
+        def upload(name, data, content_type):
+            blob = bucket.get_blob(name)
+            if blob is None or blob.size != len(data):
+                blob = bucket.blob(name)
+                blob.metadata = {"firebaseStorageDownloadTokens": str(uuid.uuid4())}
+                blob.cache_control = "public, max-age=31536000, immutable"
+                blob.upload_from_string(data, content_type=content_type)
+                blob.reload()
+                if blob.size != len(data):
+                    raise IOError(f"Firebase stored {blob.size} of {len(data)} bytes for {name}")
+            token = (blob.metadata or {}).get("firebaseStorageDownloadTokens", "").split(",")[0]
+            if not token:
+                raise IOError(f"Firebase object {name} has no download token")
+            return (
+                f"https://firebasestorage.googleapis.com/v0/b/{bucket.name}/o/"
+                f"{quote(name, safe='')}?alt=media&token={token}"
+            )
+        return upload
+
+    try:
+        import cloudinary
+        import cloudinary.uploader
+    except ImportError:
+        return None
+    if not cloudinary.config().cloud_name:
+        return None
+
+    def upload(name, data, content_type):
+        folder, _, file_name = name.rpartition("/")
+        result = cloudinary.uploader.upload(
+            BytesIO(data), folder=folder, public_id=file_name.rsplit(".", 1)[0],
+            resource_type="image", overwrite=False, unique_filename=False,
+        )
+        if not result.get("secure_url"):
+            raise IOError(f"Cloudinary did not return a URL for {name}")
+        return result["secure_url"]
+    return upload
+
+
+def bump_company_versions(apps):
+    # Cached catalog / company pages embed the logos
+    DataVersion = apps.get_model("myapi", "DataVersion")
+    DataVersion.objects.filter(Q(scope="companies") | Q(scope__startswith="company:")).update(
+        version=F("version") + 1, updated_at=timezone.now()
+    )
+
+
+def extract_inline_logos(apps, schema_editor):
+    upload = uploader()
+    if upload is None:
+        # Nowhere durable to put them: logos stay inline until
+        # manage.py extract_logos runs with a store configured
+        return
+
+    CompName = apps.get_model("myapi", "CompName")
+    candidates = (
+        CompName.objects.exclude(logo__isnull=True)
+        .exclude(logo="")
+        .exclude(logo__startswith="http")
+        .exclude(logo__startswith="/")
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+    InlineLogo = apps.get_model("myapi", "InlineLogo")
+    changed = False
+    for row in CompName.objects.filter(id__in=list(candidates)).only("id", "logo").iterator(chunk_size=200):
+        decoded = decode_inline(row.logo)
+        if not decoded:
+            continue
+        mime, data = decoded
+        try:
+            url = upload(f"company_logos/{hashlib.sha256(data).hexdigest()}.{EXTENSIONS[mime]}", data, mime)
+        except Exception:
+            # Left inline; extract_logos retries
+            continue
+        # Rewritten only once the store has confirmed the upload
+        InlineLogo.objects.update_or_create(company_id=row.id, defaults={"logo": row.logo})
+        CompName.objects.filter(id=row.id).update(logo=url)
+        changed = True
+
+    if changed:
+        bump_company_versions(apps)
+
+
+def restore_inline_logos(apps, schema_editor):
+    CompName = apps.get_model("myapi", "CompName")
+    InlineLogo = apps.get_model("myapi", "InlineLogo")
+    restored = False
+    for company_id, logo in InlineLogo.objects.values_list("company_id", "logo").iterator(chunk_size=200):
+        CompName.objects.filter(id=company_id).update(logo=logo)
+        restored = True
+    InlineLogo.objects.all().delete()
+    if restored:
+        bump_company_versions(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapi', '0011_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InlineLogo',
+            fields=[
+                ('company', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='inline_logo',
+                    serialize=False, to='myapi.compname',
+                )),
+                ('logo', models.TextField()),
+            ],
+            options={
+                'db_table': 'comp_name_inline_logo',
+            },
+        ),
+        migrations.RunPython(extract_inline_logos, restore_inline_logos),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Frozen copy of the myapi.search index definition as of this migration
+
+TABLE = "company_search"
+
+SOURCE = "FROM comp_name c LEFT JOIN comp_info i ON i.company_id = c.id"
+
+PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(c.ticker, '') || ' ' || coalesce(c.name, '')), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(c.sector, '') || ' ' || coalesce(c.industry, '')), 'B')"
+    " || setweight(to_tsvector('simple', coalesce(i.info, '')), 'C')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+                "name, ticker, sector, industry, info, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            cursor.execute(f"DELETE FROM {TABLE}")
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, name, ticker, sector, industry, info) "
+                "SELECT c.id, coalesce(c.name, ''), coalesce(c.ticker, ''), coalesce(c.sector, ''), "
+                f"coalesce(c.industry, ''), coalesce(i.info, '') {SOURCE}"
+            )
+        elif conn.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                "company_id bigint PRIMARY KEY REFERENCES comp_name (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx ON {TABLE} USING gin (document)")
+            cursor.execute(f"DELETE FROM {TABLE}")
+            cursor.execute(f"INSERT INTO {TABLE} (company_id, document) SELECT c.id, {PG_DOCUMENT} {SOURCE}")
+
+
+def drop_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor in ("sqlite", "postgresql"):
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapi', '0012_extract_inline_logos'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
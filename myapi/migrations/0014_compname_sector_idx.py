@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapi', '0013_company_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compname',
+            index=models.Index(fields=['sector', 'id'], name='compname_sector_idx'),
+        ),
+    ]
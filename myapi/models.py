@@ -2,37 +2,112 @@ from django.db import models
 
 # Create your models here.
 
-class Report(models.Model):
+def normalize_key(value):
+    """Trimmed, upper-cased ticker / exchange as stored in the *_norm columns."""
+    return (value or "").strip().upper()
+
+
+class CompanyKeyModel(models.Model):
+    """
+    Adds ticker_norm / exchange_norm, filled in on every save(), so lookups
+    by ticker + exchange can be exact matches on an index instead of
+    iexact / TRIM() scans. bulk_create() and update() bypass save(), so
+    callers using them must fill both columns themselves.
+    """
+    ticker_norm = models.CharField(max_length=20, default="", editable=False)
+    exchange_norm = models.CharField(max_length=50, default="", editable=False)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        self.ticker_norm = normalize_key(self.ticker)
+        self.exchange_norm = normalize_key(self.exchange)
+
+        extra_fields = {"ticker_norm", "exchange_norm"}
+        if hasattr(self, "link_company"):
+            self.link_company()
+            extra_fields.add("company")
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"ticker", "exchange"} & set(update_fields):
+            kwargs["update_fields"] = set(update_fields) | extra_fields
+
+        super().save(*args, **kwargs)
+
+    def _matching_company_ids(self):
+        return CompName.objects.filter(
+            ticker_norm=self.ticker_norm, exchange_norm=self.exchange_norm
+        ).order_by("id").values_list("id", flat=True)
+
+
+class Report(CompanyKeyModel):
     ticker = models.CharField(max_length=20)
     year = models.IntegerField()
     pdf_url = models.TextField(null=True, blank=True)
     thumbnail_url = models.TextField(null=True, blank=True)
     exchange = models.CharField(max_length=20, null=True, blank=True) 
 
+    # Resolved from ticker + exchange on save(); see link_company()
+    company = models.ForeignKey(
+        "CompName", null=True, blank=True, on_delete=models.SET_NULL, related_name="reports"
+    )
 
     class Meta:
         db_table = 'report'
+        indexes = [
+            models.Index(fields=["ticker_norm", "exchange_norm", "year"], name="report_company_year_idx"),
+        ]
+
+    def link_company(self):
+        self.company_id = self._matching_company_ids().first()
 
-class CompName(models.Model):
+class CompName(CompanyKeyModel):
     name = models.CharField(max_length=255)
     ticker = models.CharField(max_length=20)
 
     class Meta:
         db_table = 'comp_name'
         unique_together = ('ticker', 'exchange')
-    logo = models.TextField(blank=True, null=True)       # URL or Base64
+    logo = models.TextField(blank=True, null=True)       # URL (inline base64 is moved out by manage.py extract_logos)
     exchange = models.CharField(max_length=50, blank=True, null=True)
     sector = models.CharField(max_length=100, blank=True, null=True)
     industry = models.CharField(max_length=150, blank=True, null=True)
 
+    # Report summary, maintained by myapi.summaries (signals + rebuild command)
+    report_count = models.IntegerField(default=0, db_index=True)
+    first_report_year = models.IntegerField(null=True, blank=True)
+    latest_report_year = models.IntegerField(null=True, blank=True)
+    latest_thumbnail_url = models.TextField(null=True, blank=True)
+
     class Meta:
         db_table = 'comp_name'   # ensures Django uses your exact table name
+        indexes = [
+            models.Index(fields=["ticker_norm", "exchange_norm"], name="compname_company_idx"),
+            models.Index(fields=["exchange_norm"], name="compname_exchange_idx"),
+            # per-sector listing, keyset-paginated on id
+            models.Index(fields=["sector", "id"], name="compname_sector_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.ticker})"
+
+
+class InlineLogo(models.Model):
+    """
+    A base64 logo as CompName.logo held it before myapi.logos moved the
+    image to the media store; kept apart so company rows stay small.
+    """
+    company = models.OneToOneField(
+        CompName, primary_key=True, on_delete=models.CASCADE, related_name="inline_logo"
+    )
+    logo = models.TextField()
+
+    class Meta:
+        db_table = 'comp_name_inline_logo'
     
 
-class CompInfo(models.Model):
+class CompInfo(CompanyKeyModel):
     ticker = models.CharField(max_length=20, primary_key=True)
     emp_number = models.CharField(max_length=100, null=True, blank=True)  # ← now TEXT
     address = models.TextField(null=True, blank=True)
@@ -46,10 +121,38 @@ class CompInfo(models.Model):
     linkedin_link = models.URLField(max_length=300, null=True, blank=True)
     exchange = models.CharField(max_length=20, null=True, blank=True)
 
-    
+    # Resolved from ticker + exchange on save(); see link_company()
+    company = models.OneToOneField(
+        "CompName", null=True, blank=True, on_delete=models.SET_NULL, related_name="info"
+    )
 
     class Meta:
         db_table = 'comp_info'
+        indexes = [
+            models.Index(fields=["ticker_norm", "exchange_norm"], name="compinfo_company_idx"),
+        ]
+
+    def link_company(self):
+        # One info row per company: leave duplicates unlinked
+        company_id = self._matching_company_ids().first()
+        taken = CompInfo.objects.filter(company_id=company_id).exclude(pk=self.pk).exists()
+        self.company_id = None if company_id is None or taken else company_id
           
     def __str__(self):
         return self.ticker
+
+
+class DataVersion(models.Model):
+    """
+    Write counter for one scope of data ("companies", "reports" or one
+    company's page), bumped by myapi.versions after each committed write.
+    """
+    scope = models.CharField(max_length=255, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'data_version'
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
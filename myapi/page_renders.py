@@ -0,0 +1,251 @@
+"""
+Single report pages rendered to JPEG for /report/<id>/page/<n>.jpg?w=.
+
+Pages are rasterized by pdftoppm straight at the requested width from the
+local PDF cache copy (myapi.pdf_cache), so a peek at one page never ships
+the whole PDF to the client. Results go to a disk cache of their own with
+the same LRU policy as the PDF cache: hits bump the file mtime and the
+oldest files are evicted past PAGE_RENDER_CACHE_MAX_BYTES.
+
+Renders, including any PDF fetch they need, run on a small per-process
+thread pool (each render is a poppler subprocess): identical concurrent
+requests share one render, and once PAGE_RENDER_MAX_PENDING distinct
+renders are queued further ones are turned away before they download
+anything, instead of piling up behind the API.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from pdf2image import convert_from_path
+
+from . import http_client, pdf_cache
+
+
+class PageNotFound(Exception):
+    pass
+
+
+class RendererBusy(Exception):
+    pass
+
+
+def snap_width(width):
+    """Requested width rounded up to PAGE_RENDER_WIDTH_STEP and clamped, so the cache stays small."""
+    step = settings.PAGE_RENDER_WIDTH_STEP
+    width = -(-width // step) * step
+    return max(step, min(width, settings.PAGE_RENDER_MAX_WIDTH))
+
+
+def local_pdf(report):
+    """Path of a complete local copy of the report's PDF, fetched into the PDF cache if needed."""
+    cache = pdf_cache.get_cache()
+    if not cache.enabled:
+        raise IOError("The PDF cache is disabled")
+
+    key = cache.key_for(report.id, report.pdf_url)
+    entry = cache.lookup(key)
+    if entry and not entry.needs_revalidation(cache.revalidate_after):
+        cache.count("hits")
+        cache.touch(entry)
+        return entry.path
+
+    def fetch_upstream(extra_headers):
+        return http_client.get(
+            report.pdf_url,
+            headers={"Accept-Encoding": "identity", **extra_headers},
+            stream=True,
+        )
+
+    result = cache.fetch(key, fetch_upstream)
+    if not isinstance(result, pdf_cache.CacheEntry):
+        # Someone's download, maybe ours: wait for it to land in the cache
+        cache.count("misses")
+        try:
+            for _ in result:
+                pass
+        finally:
+            result.close()
+        result = cache.lookup(key)
+        if result is None:
+            raise IOError("Upstream PDF fetch did not complete")
+    cache.touch(result)
+    return result.path
+
+
+def _pin_pdf(report, directory):
+    """
+    A link to the report's cached PDF inside directory, which the PDF cache
+    cannot evict while poppler reads it. Fetches again once if the cached
+    copy is evicted before it is linked.
+    """
+    path = os.path.join(directory, "report.pdf")
+    for attempt in range(2):
+        source = local_pdf(report)
+        try:
+            try:
+                os.link(source, path)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                shutil.copyfile(source, path)
+            return path
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+
+class PageRenderer:
+    def __init__(self, directory, max_bytes, workers, max_pending, timeout, quality, wait=None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.quality = quality
+        # how long a request waits for the fetch + render it joined
+        self.wait = timeout if wait is None else wait
+        self.counters = {
+            "hits": 0, "misses": 0, "coalesced": 0, "rejected": 0, "evictions": 0,
+        }
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="page-render")
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def key_for(self, report_id, url, page, width):
+        return hashlib.sha256(f"{report_id}:{url}:{page}:{width}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.jpg")
+
+    def lookup(self, key):
+        """Open file of a cached render, marked as recently used, or None."""
+        path = self._path(key)
+        try:
+            # an open file outlives a concurrent eviction
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.count("hits")
+        return f
+
+    def render(self, key, report, page, width):
+        """
+        JPEG bytes of the report's page, shared with any identical render
+        already running. Raises RendererBusy when the queue is full (before
+        the PDF is fetched) and PageNotFound past the last page.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+            elif len(self._inflight) >= self.max_pending:
+                self.counters["rejected"] += 1
+                raise RendererBusy("Too many pages being rendered")
+            else:
+                self.counters["misses"] += 1
+                future = self._executor.submit(self._render, key, report, page, width)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._done(key))
+
+        return future.result(timeout=self.wait)
+
+    def _done(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _render(self, key, report, page, width):
+        # next to the cached PDFs, so the link is on the same filesystem
+        cache_dir = pdf_cache.get_cache().directory
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix="render-", dir=cache_dir) as directory:
+            pages = convert_from_path(
+                _pin_pdf(report, directory), first_page=page, last_page=page, size=(width, None),
+                single_file=True, thread_count=1, timeout=self.timeout,
+            )
+        if not pages:
+            raise PageNotFound(f"No page {page}")
+
+        buffer = BytesIO()
+        pages[0].convert("RGB").save(buffer, "JPEG", quality=self.quality, optimize=True, progressive=True)
+        data = buffer.getvalue()
+
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        self.evict()
+        return data
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(".jpg"):
+                        st = item.stat()
+                        entries.append((st.st_mtime, st.st_size, item.path))
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.count("evictions")
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            data = dict(self.counters, rendering=len(self._inflight))
+        data.update({
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        })
+        return data
+
+
+_renderer = None
+
+
+def get_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = PageRenderer(
+            settings.PAGE_RENDER_CACHE_DIR,
+            settings.PAGE_RENDER_CACHE_MAX_BYTES,
+            settings.PAGE_RENDER_WORKERS,
+            settings.PAGE_RENDER_MAX_PENDING,
+            settings.PAGE_RENDER_TIMEOUT,
+            settings.PAGE_RENDER_QUALITY,
+            settings.PAGE_RENDER_WAIT_SECONDS,
+        )
+    return _renderer
@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ReportCursorPagination(CursorPagination):
+    """
+    Keyset pagination on the primary key: each page is a
+    "WHERE id > <cursor> ORDER BY id LIMIT n" query, so deep pages cost the
+    same as the first one on SQLite and Postgres alike. Cursors are opaque
+    base64 tokens in ?cursor=.
+    """
+    ordering = "id"
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class CompanyCursorPagination(ReportCursorPagination):
+    """The same keyset pagination, for company listings."""
@@ -0,0 +1,96 @@
+"""
+Rendered JSON bodies for the large read endpoints, cached next to their
+gzip encoding.
+
+Entries are keyed by the response's ETag (so by data version) plus host
+and full path, and hold the plain bytes and, past API_GZIP_MIN_BYTES, the
+gzipped bytes. A repeat request is answered straight from the cache with
+whichever encoding it accepts: no query, no serialization, no compression.
+"""
+import gzip
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+GZIP_LEVEL = 6
+
+
+def accepts_gzip(request):
+    """Accept-Encoding negotiation per RFC 9110, including q=0 and "*"."""
+    qualities = {}
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+
+    if "gzip" in qualities:
+        return qualities["gzip"] > 0
+    if "x-gzip" in qualities:
+        return qualities["x-gzip"] > 0
+    return qualities.get("*", 0) > 0
+
+
+def _key(request, etag):
+    url = f"{request.scheme}://{request.get_host()}{request.get_full_path()}"
+    return f"payload:{etag}:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+def _response(request, entry):
+    content_type, body, gzipped = entry
+    if gzipped is not None and accepts_gzip(request):
+        response = HttpResponse(gzipped, content_type=content_type)
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(body, content_type=content_type)
+
+    # Both encodings are served from this URL whenever a gzip copy exists
+    if gzipped is not None:
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def respond(request, etag, view):
+    """
+    Cached response for a DRF GET handler. view() runs only on a miss, and
+    only 200 responses rendered as JSON are cached; anything else (the
+    browsable API, errors) is passed through untouched.
+    """
+    renderer = getattr(request, "accepted_renderer", None)
+    if not isinstance(renderer, JSONRenderer):
+        return view()
+
+    key = _key(request, etag)
+    entry = cache.get(key)
+    if entry is None:
+        response = view()
+        if not isinstance(response, Response) or response.status_code != 200:
+            return response
+
+        context = dict(request.parser_context, request=request, response=response)
+        body = renderer.render(response.data, request.accepted_media_type, context)
+        gzipped = None
+        if len(body) >= settings.API_GZIP_MIN_BYTES:
+            gzipped = gzip.compress(body, GZIP_LEVEL)
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+
+        entry = (content_type, body, gzipped)
+        cache.set(key, entry, settings.API_PAYLOAD_CACHE_SECONDS)
+
+    return _response(request, entry)
@@ -0,0 +1,384 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+LOCK_POLL_INTERVAL = 0.05
+
+# .part files older than this belong to a worker that died mid-download
+STALE_PART_SECONDS = 3600
+
+
+class CacheEntry:
+    def __init__(self, key, path, meta):
+        self.key = key
+        self.path = path
+        self.size = meta.get("size", 0)
+        self.etag = meta.get("etag")
+        self.last_modified = meta.get("last_modified")
+        self.checked_at = meta.get("checked_at", 0)
+
+    def needs_revalidation(self, max_age):
+        # Without validators the URL itself is the only version we know of
+        if not (self.etag or self.last_modified):
+            return False
+        return time.time() - self.checked_at > max_age
+
+    def conditional_headers(self):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class Flight:
+    """
+    Tails the .part file of an in-flight download until the leader that
+    holds the key's lock has finished writing it.
+    """
+
+    def __init__(self, cache, key, part_path, size):
+        self.cache = cache
+        self.key = key
+        self.size = size
+        self._file = open(part_path, "rb")
+
+    def __iter__(self):
+        cache = self.cache
+        read = 0
+        idle_since = time.monotonic()
+
+        while True:
+            chunk = self._file.read(cache.chunk_size)
+            if chunk:
+                read += len(chunk)
+                idle_since = time.monotonic()
+                yield chunk
+                continue
+
+            lock_fd = cache._try_lock(self.key, shared=True)
+            if lock_fd is not None:
+                cache._unlock(lock_fd)
+                # Leader is done; drain whatever landed after our last read
+                for chunk in iter(lambda: self._file.read(cache.chunk_size), b""):
+                    read += len(chunk)
+                    yield chunk
+                break
+
+            if time.monotonic() - idle_since > cache.stall_timeout:
+                raise TimeoutError("Upstream PDF fetch stalled")
+            time.sleep(LOCK_POLL_INTERVAL)
+
+        if self.size is not None:
+            complete = read == self.size
+        else:
+            complete = cache.lookup(self.key) is not None
+        if not complete:
+            raise IOError("Upstream PDF fetch did not complete")
+
+    def close(self):
+        self._file.close()
+
+
+class PdfCache:
+    """
+    Disk cache of report PDFs keyed by Report.id + upstream URL.
+
+    Each entry is <key>.pdf plus a <key>.json sidecar holding the upstream
+    ETag / Last-Modified. The .pdf mtime is bumped on every hit and the
+    least recently used entries are evicted once the directory grows past
+    max_bytes. Counters are per process.
+    """
+
+    def __init__(self, directory, max_bytes, revalidate_after, chunk_size=64 * 1024, stall_timeout=60):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.revalidate_after = revalidate_after
+        self.chunk_size = chunk_size
+        self.stall_timeout = stall_timeout
+        self.counters = {
+            "hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "revalidations": 0,
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def key_for(self, report_id, url):
+        return hashlib.sha256(f"{report_id}:{url}".encode()).hexdigest()
+
+    def _pdf_path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _meta_path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def lookup(self, key):
+        path = self._pdf_path(key)
+        try:
+            with open(self._meta_path(key)) as f:
+                meta = json.load(f)
+            if os.path.getsize(path) != meta.get("size"):
+                return None
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(key, path, meta)
+
+    def open(self, entry):
+        """
+        Open file of the entry's PDF, or None if it was evicted (or replaced)
+        since lookup. The open file outlives any later eviction.
+        """
+        try:
+            f = open(entry.path, "rb")
+        except FileNotFoundError:
+            return None
+        if os.fstat(f.fileno()).st_size != entry.size:
+            f.close()
+            return None
+        return f
+
+    def touch(self, entry):
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+
+    def mark_revalidated(self, entry):
+        entry.checked_at = time.time()
+        self._write_meta(entry.key, {
+            "size": entry.size,
+            "etag": entry.etag,
+            "last_modified": entry.last_modified,
+            "checked_at": entry.checked_at,
+        })
+
+    def _write_meta(self, key, meta):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".meta")
+        with os.fdopen(fd, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path(key))
+
+    def _lock_path(self, key):
+        return os.path.join(self.directory, f"{key}.lock")
+
+    def _inflight_path(self, key):
+        return os.path.join(self.directory, f"{key}.inflight")
+
+    def _try_lock(self, key, shared=False):
+        path = self._lock_path(key)
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return None
+            # evict() may have unlinked the file between our open and flock;
+            # a lock on that orphan excludes nobody, so start over
+            try:
+                if os.stat(path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            self._unlock(fd)
+
+    def _unlock(self, fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def fetch(self, key, fetch_upstream, timeout=60):
+        """
+        Single-flight fetch of an entry.
+
+        The first caller takes an exclusive flock on <key>.lock (shared by
+        threads and gunicorn workers alike), starts the upstream download
+        into a .part file on a background thread and returns a Flight that
+        tails it. Concurrent callers find the in-flight .part and tail the
+        same file instead of opening their own upstream connection.
+
+        Returns a fresh CacheEntry if the PDF is (or just became) cached,
+        otherwise a Flight. Upstream errors raise.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        deadline = time.monotonic() + timeout
+
+        while True:
+            lock_fd = self._try_lock(key)
+            if lock_fd is not None:
+                return self._lead(key, lock_fd, fetch_upstream)
+
+            flight = self._join(key)
+            if flight is not None:
+                self.count("coalesced")
+                return flight
+
+            if time.monotonic() > deadline:
+                raise TimeoutError("Timed out waiting for in-flight PDF fetch")
+            time.sleep(LOCK_POLL_INTERVAL)
+
+    def _lead(self, key, lock_fd, fetch_upstream):
+        upstream = None
+        try:
+            entry = self.lookup(key)
+            headers = {}
+            if entry:
+                if not entry.needs_revalidation(self.revalidate_after):
+                    self._unlock(lock_fd)
+                    return entry
+                self.count("revalidations")
+                headers = entry.conditional_headers()
+
+            upstream = fetch_upstream(headers)
+            if entry and upstream.status_code == 304:
+                upstream.close()
+                self.mark_revalidated(entry)
+                self._unlock(lock_fd)
+                return entry
+            upstream.raise_for_status()
+
+            size = upstream.headers.get("Content-Length")
+            size = int(size) if size and not upstream.headers.get("Content-Encoding") else None
+
+            part_path = os.path.join(self.directory, f"{key}.{uuid.uuid4().hex}.part")
+            open(part_path, "wb").close()
+            flight = Flight(self, key, part_path, size)
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".meta")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"part": part_path, "size": size}, f)
+            os.replace(tmp_path, self._inflight_path(key))
+        except BaseException:
+            if upstream is not None:
+                upstream.close()
+            self._unlock(lock_fd)
+            raise
+
+        threading.Thread(
+            target=self._download,
+            args=(key, lock_fd, upstream, part_path),
+            daemon=True,
+        ).start()
+        return flight
+
+    def _join(self, key):
+        try:
+            with open(self._inflight_path(key)) as f:
+                info = json.load(f)
+            return Flight(self, key, info["part"], info["size"])
+        except (OSError, ValueError, KeyError):
+            # Not started yet, or already committed and renamed
+            return None
+
+    def _download(self, key, lock_fd, upstream, part_path):
+        # Runs detached from any client, so one disconnecting viewer does
+        # not abort the fetch the others are tailing.
+        written = 0
+        complete = False
+        try:
+            with open(part_path, "wb", buffering=0) as f:
+                for chunk in upstream.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+                        written += len(chunk)
+            expected = upstream.headers.get("Content-Length")
+            complete = not expected or int(expected) == written
+            if complete:
+                os.replace(part_path, self._pdf_path(key))
+                self._write_meta(key, {
+                    "size": written,
+                    "etag": upstream.headers.get("ETag"),
+                    "last_modified": upstream.headers.get("Last-Modified"),
+                    "checked_at": time.time(),
+                })
+        finally:
+            upstream.close()
+            for path in ([] if complete else [part_path]) + [self._inflight_path(key)]:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            self._unlock(lock_fd)
+
+        if complete:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if item.name.endswith(".pdf"):
+                        st = item.stat()
+                        entries.append((st.st_mtime, st.st_size, item.name[:-4]))
+                    elif item.name.endswith(".part"):
+                        if time.time() - item.stat().st_mtime > STALE_PART_SECONDS:
+                            try:
+                                os.unlink(item.path)
+                            except FileNotFoundError:
+                                pass
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            # Skip entries being fetched or revalidated. Holding the lock is
+            # also what makes unlinking the lock file safe (see _try_lock).
+            lock_fd = self._try_lock(key)
+            if lock_fd is None:
+                continue
+            try:
+                for path in (self._pdf_path(key), self._meta_path(key), self._lock_path(key)):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+            finally:
+                self._unlock(lock_fd)
+            total -= size
+            self.count("evictions")
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            data = dict(self.counters)
+        data.update({
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        })
+        return data
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = PdfCache(
+            settings.PDF_CACHE_DIR,
+            settings.PDF_CACHE_MAX_BYTES,
+            settings.PDF_CACHE_REVALIDATE_SECONDS,
+            chunk_size=settings.REPORT_STREAM_CHUNK_SIZE,
+        )
+    return _cache
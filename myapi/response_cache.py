@@ -0,0 +1,75 @@
+"""
+Cached payloads for the company page (company-reports/<ticker>/<exchange>/).
+
+Entries are keyed by the normalized (ticker, exchange) plus that company's
+data version. The write hooks in myapi.signals bump the version of every
+company a CompName, Report or CompInfo write touches, so only those pages
+are rebuilt. A rebuild that races a write stores its result under the old
+version, where nobody reads it again.
+"""
+import time
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import versions
+
+LOCK_POLL_INTERVAL = 0.05
+
+# Stored in place of None so a cached "not found" is not mistaken for a miss
+_MISSING = "__missing__"
+
+
+def company_scope(ticker_norm, exchange_norm):
+    return f"company:{quote(ticker_norm, safe='')}:{quote(exchange_norm, safe='')}"
+
+
+def company_from_scope(scope):
+    """(ticker_norm, exchange_norm) of a company_scope() string, else None."""
+    kind, _, rest = scope.partition(":")
+    ticker, sep, exchange = rest.partition(":")
+    if kind != "company" or not sep:
+        return None
+    return unquote(ticker), unquote(exchange)
+
+
+def invalidate_company(ticker_norm, exchange_norm):
+    if ticker_norm or exchange_norm:
+        versions.bump(company_scope(ticker_norm, exchange_norm))
+
+
+def cached_company_page(ticker_norm, exchange_norm, build):
+    """
+    build() for the company, or its cached result.
+
+    On a miss one caller takes a short cache.add() lock and rebuilds; the
+    others poll for its result instead of all hitting the database at once,
+    and rebuild themselves only if the lock holder takes too long.
+    """
+    scope = company_scope(ticker_norm, exchange_norm)
+    key = f"company-page:{scope}:{versions.get_version(scope)}"
+
+    value = cache.get(key)
+    if value is not None:
+        return None if value == _MISSING else value
+
+    lock_key = f"{key}:lock"
+    lock_seconds = settings.COMPANY_PAGE_LOCK_SECONDS
+    locked = cache.add(lock_key, 1, lock_seconds)
+
+    if not locked:
+        deadline = time.monotonic() + lock_seconds
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return None if value == _MISSING else value
+
+    try:
+        value = build()
+        cache.set(key, _MISSING if value is None else value, settings.COMPANY_PAGE_CACHE_SECONDS)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
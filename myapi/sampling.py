@@ -0,0 +1,62 @@
+"""
+Random company/report sampling for the homepage endpoints.
+
+Instead of ORDER BY RANDOM() over the whole table, the ids of companies
+that have at least one report (indexed CompName.report_count) are loaded
+once per data version and kept in memory; each call draws from that array
+and fetches the picks with a fixed number of queries, whatever the table
+size.
+"""
+import random
+from collections import defaultdict
+
+from . import versions
+from .models import CompName, Report
+
+_eligible = (None, [])
+
+
+def data_version():
+    return f"{versions.get_version('companies')}.{versions.get_version('reports')}"
+
+
+def eligible_company_ids():
+    global _eligible
+
+    version = data_version()
+    if _eligible[0] != version:
+        ids = list(
+            CompName.objects.filter(report_count__gt=0)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        _eligible = (version, ids)
+    return _eligible[1]
+
+
+def sample_companies(k):
+    ids = eligible_company_ids()
+    picked = random.sample(ids, min(k, len(ids)))
+    companies = CompName.objects.in_bulk(picked)
+    return [companies[pk] for pk in picked if pk in companies]
+
+
+def sample_company_reports(k):
+    """
+    [(company, report dict or None)] for up to k random companies, with one
+    random report each. Three queries at most, one of them memoized.
+    """
+    companies = sample_companies(k)
+
+    # Report.company is resolved from the normalized ticker + exchange, so
+    # the same ticker on another exchange (or in another case) stays apart
+    reports = defaultdict(list)
+    for row in Report.objects.filter(company_id__in=[c.id for c in companies]).values(
+        "id", "ticker", "year", "pdf_url", "thumbnail_url", "company_id"
+    ):
+        reports[row.pop("company_id")].append(row)
+
+    return [
+        (comp, random.choice(reports[comp.id]) if reports[comp.id] else None)
+        for comp in companies
+    ]
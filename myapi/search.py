@@ -0,0 +1,160 @@
+"""
+Full-text company search behind /api/search/?q=.
+
+The index is a side table, company_search, with one row per CompName
+built from its name, ticker, sector, industry and linked CompInfo.info:
+
+* SQLite: an FTS5 virtual table (rowid = CompName.id), ranked by bm25()
+* PostgreSQL: a weighted tsvector per company under a GIN index, ranked
+  by ts_rank_cd()
+
+Other databases fall back to icontains lookups. The write hooks in
+myapi.signals re-index a company whenever it or its info row changes;
+rebuild() (manage.py rebuild_search_index) re-indexes every company with
+one INSERT ... SELECT. Migration 0013 holds its own copy of the table
+definition, so changes here need a new migration.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from . import versions
+from .models import CompName
+
+TABLE = "company_search"
+
+# Search terms beyond this are ignored
+MAX_TERMS = 8
+
+# bm25() weights, in FTS5 column order: name, ticker, sector, industry, info
+SQLITE_WEIGHTS = "10.0, 10.0, 3.0, 3.0, 1.0"
+
+_SOURCE = "FROM comp_name c LEFT JOIN comp_info i ON i.company_id = c.id"
+
+_PG_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(c.ticker, '') || ' ' || coalesce(c.name, '')), 'A')"
+    " || setweight(to_tsvector('simple', coalesce(c.sector, '') || ' ' || coalesce(c.industry, '')), 'B')"
+    " || setweight(to_tsvector('simple', coalesce(i.info, '')), 'C')"
+)
+
+_TERM = re.compile(r"\w+")
+
+
+def _supported(conn):
+    return conn.vendor in ("sqlite", "postgresql")
+
+
+def create_index(conn):
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+                "name, ticker, sector, industry, info, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        elif conn.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+                "company_id bigint PRIMARY KEY REFERENCES comp_name (id) ON DELETE CASCADE, "
+                "document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_document_idx ON {TABLE} USING gin (document)")
+
+
+def drop_index(conn):
+    if _supported(conn):
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def _key_column(conn):
+    return "rowid" if conn.vendor == "sqlite" else "company_id"
+
+
+def _reindex(conn, ids=None):
+    where, params = "", []
+    with conn.cursor() as cursor:
+        if ids is None:
+            cursor.execute(f"DELETE FROM {TABLE}")
+        else:
+            placeholders = ", ".join(["%s"] * len(ids))
+            params = list(ids)
+            cursor.execute(f"DELETE FROM {TABLE} WHERE {_key_column(conn)} IN ({placeholders})", params)
+            where = f"WHERE c.id IN ({placeholders})"
+
+        if conn.vendor == "sqlite":
+            cursor.execute(
+                f"INSERT INTO {TABLE} (rowid, name, ticker, sector, industry, info) "
+                "SELECT c.id, coalesce(c.name, ''), coalesce(c.ticker, ''), coalesce(c.sector, ''), "
+                f"coalesce(c.industry, ''), coalesce(i.info, '') {_SOURCE} {where}",
+                params,
+            )
+        else:
+            cursor.execute(
+                f"INSERT INTO {TABLE} (company_id, document) SELECT c.id, {_PG_DOCUMENT} {_SOURCE} {where}",
+                params,
+            )
+
+
+def index_companies(ids, conn=connection, batch_size=500):
+    """Re-index the given CompName ids; ids that no longer exist are dropped."""
+    ids = list(ids)
+    if not ids or not _supported(conn):
+        return
+    for start in range(0, len(ids), batch_size):
+        _reindex(conn, ids[start:start + batch_size])
+    versions.bump("search")
+
+
+def rebuild(conn=connection):
+    # No version bump: callers bump "search"
+    if _supported(conn):
+        _reindex(conn)
+
+
+def terms(query):
+    return _TERM.findall(query.lower())[:MAX_TERMS]
+
+
+def search(query, limit, offset=0):
+    """
+    CompName ids matching every term of query (as a prefix), best first.
+    Ties go to companies with more reports.
+    """
+    words = terms(query)
+    if not words:
+        return []
+
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT {TABLE}.rowid FROM {TABLE} JOIN comp_name c ON c.id = {TABLE}.rowid "
+            f"WHERE {TABLE} MATCH %s "
+            f"ORDER BY bm25({TABLE}, {SQLITE_WEIGHTS}), c.report_count DESC, c.id "
+            "LIMIT %s OFFSET %s"
+        )
+        # quoted so FTS5 operators in the input stay plain text
+        params = [" ".join(f'"{word}"*' for word in words), limit, offset]
+    elif connection.vendor == "postgresql":
+        sql = (
+            f"SELECT s.company_id FROM {TABLE} s JOIN comp_name c ON c.id = s.company_id, "
+            "to_tsquery('simple', %s) query "
+            "WHERE s.document @@ query "
+            "ORDER BY ts_rank_cd(s.document, query) DESC, c.report_count DESC, c.id "
+            "LIMIT %s OFFSET %s"
+        )
+        # \w+ terms never contain tsquery operators
+        params = [" & ".join(f"{word}:*" for word in words), limit, offset]
+    else:
+        match = Q()
+        for word in words:
+            match &= (
+                Q(name__icontains=word) | Q(ticker__icontains=word) | Q(sector__icontains=word)
+                | Q(industry__icontains=word) | Q(info__info__icontains=word)
+            )
+        qs = CompName.objects.filter(match).order_by("-report_count", "id").values_list("id", flat=True)
+        return list(qs[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
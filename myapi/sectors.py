@@ -0,0 +1,91 @@
+"""
+Sector -> industry -> company counts for the frontend's /sectorslist page.
+
+One GROUP BY over CompName (sector, industry), materialized into the
+nested structure the page renders and cached per "sectors" data version.
+Only CompName writes bump that version, so report uploads never trigger
+a recount.
+
+Sector and industry names are trimmed, so stray whitespace in the data
+neither splits a sector nor hides companies from SectorCompanies.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import versions
+from .models import CompName
+
+
+def _name(value):
+    # "Tech" and "Tech " are one sector; a blank one is unclassified
+    return (value or "").strip()
+
+
+def _build():
+    sectors = {}
+    # sector name -> industry name -> the (sector, industry) values stored for it
+    spellings = {}
+    unclassified = 0
+    total = 0
+
+    rows = CompName.objects.values("sector", "industry").annotate(count=Count("id")).order_by()
+    for row in rows:
+        total += row["count"]
+        sector_name = _name(row["sector"])
+        if not sector_name:
+            unclassified += row["count"]
+            continue
+        industry_name = _name(row["industry"]) or None
+
+        sector = sectors.setdefault(sector_name, {"sector": sector_name, "count": 0, "industries": {}})
+        sector["count"] += row["count"]
+        industry = sector["industries"].setdefault(industry_name, {"industry": industry_name, "count": 0})
+        industry["count"] += row["count"]
+        spellings.setdefault(sector_name, {}).setdefault(industry_name, []).append(
+            (row["sector"], row["industry"])
+        )
+
+    for sector in sectors.values():
+        sector["industries"] = sorted(
+            sector["industries"].values(), key=lambda item: (-item["count"], item["industry"] or "")
+        )
+
+    tree = {
+        "total": total,
+        "unclassified": unclassified,
+        "sectors": sorted(sectors.values(), key=lambda item: (-item["count"], item["sector"])),
+    }
+    return {"tree": tree, "spellings": spellings}
+
+
+def _load():
+    key = f"sector-tree:{versions.get_version('sectors')}"
+    built = cache.get(key)
+    if built is None:
+        built = _build()
+        cache.set(key, built, None)
+    return built
+
+
+def sector_tree():
+    return _load()["tree"]
+
+
+def company_filter(sector, industry=""):
+    """
+    Q for the companies sector_tree() counts under sector (and industry),
+    as exact matches on the stored values so the (sector, id) index still
+    applies.
+    """
+    industries = _load()["spellings"].get(_name(sector), {})
+    if _name(industry):
+        stored = industries.get(_name(industry), [])
+    else:
+        stored = [pair for pairs in industries.values() for pair in pairs]
+    if not stored:
+        return Q(pk__in=[])
+
+    match = Q(sector__in={s for s, _ in stored})
+    if _name(industry):
+        match &= Q(industry__in={i for _, i in stored})
+    return match
@@ -1,3 +1,5 @@
+from urllib.parse import urljoin
+
 from rest_framework import serializers
 from .models import CompName, CompInfo, Report
 
@@ -36,3 +38,36 @@ class ReportSerializer(serializers.ModelSerializer):
         model = Report
         fields = ["id", "year",  'pdf_url', 'thumbnail_url', 'exchange']
 
+
+# ---------------------------------------------------------------------------
+# Fast paths for list endpoints. Same output as the ModelSerializers above,
+# built from .values() / .values_list() rows without per-field machinery.
+# ---------------------------------------------------------------------------
+
+REPORT_FIELDS = ("id", "year", "pdf_url", "thumbnail_url", "exchange")
+
+
+def absolute_url_builder(request):
+    """
+    Equivalent of request.build_absolute_uri(location) with the host and
+    scheme resolved once per request instead of once per row.
+    """
+    current = request.build_absolute_uri()
+    root = request.build_absolute_uri("/")[:-1]
+
+    def build(location):
+        if not location:
+            return None
+        if location.startswith(("http://", "https://", "data:")):
+            return location
+        if location.startswith("/"):
+            return root + location
+        return urljoin(current, location)
+
+    return build
+
+
+def report_rows(queryset):
+    """ReportSerializer(queryset, many=True).data as plain dicts."""
+    return list(queryset.values(*REPORT_FIELDS))
+
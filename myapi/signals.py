@@ -0,0 +1,81 @@
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import response_cache, search, summaries, versions
+from .models import CompInfo, CompName, Report
+
+
+def _link_company_rows(company):
+    # Re-point reports / info at a new or re-keyed company
+    key = {"ticker_norm": company.ticker_norm, "exchange_norm": company.exchange_norm}
+
+    Report.objects.filter(company=company).exclude(**key).update(company=None)
+    Report.objects.filter(company__isnull=True, **key).update(company=company)
+
+    CompInfo.objects.filter(company=company).exclude(**key).update(company=None)
+    if not CompInfo.objects.filter(company=company).exists():
+        info_pk = CompInfo.objects.filter(company__isnull=True, **key).values_list("pk", flat=True).first()
+        if info_pk is not None:
+            CompInfo.objects.filter(pk=info_pk).update(company=company)
+
+
+def _touched_companies(instance):
+    # The (ticker_norm, exchange_norm) keys a write affects: the row's
+    # current key plus the one it was saved under before, if different.
+    company = (instance.ticker_norm, instance.exchange_norm)
+    previous = getattr(instance, "_previous_company", None)
+    if previous and previous != company:
+        return [company, previous]
+    return [company]
+
+
+@receiver(pre_save, sender=Report)
+@receiver(pre_save, sender=CompName)
+@receiver(pre_save, sender=CompInfo)
+def remember_previous_company(sender, instance, **kwargs):
+    # The row may be moving to another company; that one needs a refresh too
+    instance._previous_company = None
+    if instance.pk:
+        instance._previous_company = (
+            sender.objects.filter(pk=instance.pk).values_list("ticker_norm", "exchange_norm").first()
+        )
+
+
+@receiver([post_save, post_delete], sender=CompName)
+def company_changed(sender, instance, **kwargs):
+    if kwargs.get("signal") is post_save:
+        _link_company_rows(instance)
+        # A new or re-keyed company may already have reports
+        summaries.refresh_company_summary(CompName, Report, instance.ticker, instance.exchange)
+
+    for company in _touched_companies(instance):
+        response_cache.invalidate_company(*company)
+    # also drops the row from the index after a delete
+    search.index_companies([instance.id])
+    versions.bump("companies")
+    versions.bump("sectors")
+
+
+@receiver([post_save, post_delete], sender=CompInfo)
+def company_info_changed(sender, instance, **kwargs):
+    companies = _touched_companies(instance)
+    for company in companies:
+        response_cache.invalidate_company(*company)
+
+    # CompInfo.info is part of the search text
+    match = Q()
+    for ticker_norm, exchange_norm in companies:
+        match |= Q(ticker_norm=ticker_norm, exchange_norm=exchange_norm)
+    search.index_companies(CompName.objects.filter(match).values_list("id", flat=True))
+
+
+@receiver([post_save, post_delete], sender=Report)
+def report_changed(sender, instance, **kwargs):
+    for company in _touched_companies(instance):
+        summaries.refresh_company_summary(CompName, Report, *company)
+        response_cache.invalidate_company(*company)
+
+    versions.bump("reports")
+    # the company summaries above changed too
+    versions.bump("companies")
@@ -0,0 +1,175 @@
+"""
+sitemap.xml for arannualreport.com.
+
+sitemap.xml is an index pointing at sitemap-static.xml plus one or more
+shards per exchange (sitemap-<exchange>-<n>.xml), each well under the
+50,000 URL limit. The index points at the shards on this backend
+(SITEMAP_SHARD_BASE_URL, else the requested host); the page URLs inside
+them are on the site (SITEMAP_BASE_URL). Shards are rendered from a row iterator straight into a
+gzip stream, and the compressed bytes are cached until a CompName or
+Report write bumps the data version.
+"""
+import gzip
+import hashlib
+import math
+import re
+from datetime import date
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from . import versions
+from .models import CompName, Report
+
+STATIC_PAGES = ["/", "/AllCompanies", "/sectorslist"]
+
+
+def _version():
+    return f"{versions.get_version('companies')}.{versions.get_version('reports')}"
+
+
+def _slug(exchange):
+    slug = re.sub(r"[^a-z0-9]+", "", exchange.lower())
+    if slug and slug == exchange.lower():
+        return slug
+    # Dropped characters could make two exchanges ("N.S.E", "NSE") share
+    # a slug; a hash of the exact name keeps them apart
+    return f"{slug or 'other'}-{hashlib.sha1(exchange.encode()).hexdigest()[:8]}"
+
+
+def _companies():
+    return CompName.objects.exclude(ticker_norm="").exclude(exchange_norm="")
+
+
+def _lastmod(year):
+    if not year:
+        return None
+    return min(date(year, 12, 31), date.today()).isoformat()
+
+
+def _gzip(pieces):
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as gz:
+        for piece in pieces:
+            gz.write(piece.encode())
+    return buf.getvalue()
+
+
+def _url_entry(loc, lastmod=None):
+    entry = f"<url><loc>{escape(loc)}</loc>"
+    if lastmod:
+        entry += f"<lastmod>{lastmod}</lastmod>"
+    return entry + "</url>\n"
+
+
+def shard_layout():
+    """
+    [(section name, exchange, shard number, newest report year)] for every
+    company shard, computed with one GROUP BY and cached per data version.
+    """
+    key = f"sitemap:{_version()}:layout"
+    layout = cache.get(key)
+    if layout is not None:
+        return layout
+
+    shard_size = settings.SITEMAP_SHARD_SIZE
+    latest_years = dict(
+        Report.objects.values("exchange_norm")
+        .annotate(latest=Max("year"))
+        .order_by()
+        .values_list("exchange_norm", "latest")
+    )
+
+    layout = []
+    counts = _companies().values("exchange_norm").annotate(n=Count("id")).order_by("exchange_norm")
+    for row in counts:
+        exchange = row["exchange_norm"]
+        for number in range(1, math.ceil(row["n"] / shard_size) + 1):
+            layout.append((f"{_slug(exchange)}-{number}", exchange, number, latest_years.get(exchange)))
+
+    cache.set(key, layout, None)
+    return layout
+
+
+def is_section(section):
+    """
+    Whether sitemap-<section>.xml exists: "static" or a company shard.
+    "index" is served only as sitemap.xml, with the shard base URL.
+    """
+    return section == "static" or any(name == section for name, *_ in shard_layout())
+
+
+def _render_index(layout, base):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    yield f"<sitemap><loc>{escape(base)}/sitemap-static.xml</loc></sitemap>\n"
+    for name, _, _, year in layout:
+        yield f"<sitemap><loc>{escape(base)}/sitemap-{name}.xml</loc>"
+        if year:
+            yield f"<lastmod>{_lastmod(year)}</lastmod>"
+        yield "</sitemap>\n"
+    yield "</sitemapindex>\n"
+
+
+def _render_urlset(entries):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    yield from entries
+    yield "</urlset>\n"
+
+
+def _static_entries():
+    base = settings.SITEMAP_BASE_URL
+    for page in STATIC_PAGES:
+        yield _url_entry(base + page)
+
+
+def _company_entries(exchange, number):
+    base = settings.SITEMAP_BASE_URL
+    shard_size = settings.SITEMAP_SHARD_SIZE
+    latest_year = Report.objects.filter(
+        ticker_norm=OuterRef("ticker_norm"), exchange_norm=OuterRef("exchange_norm")
+    ).order_by("-year").values("year")[:1]
+
+    rows = (
+        _companies()
+        .filter(exchange_norm=exchange)
+        .annotate(latest_year=Subquery(latest_year))
+        .order_by("id")
+        .values_list("ticker", "exchange", "latest_year")
+    )[(number - 1) * shard_size:number * shard_size]
+
+    for ticker, comp_exchange, year in rows.iterator(chunk_size=2000):
+        yield _url_entry(
+            f"{base}/company-reports/{ticker.strip()}/{comp_exchange.strip()}", _lastmod(year)
+        )
+
+
+def gzipped_section(section, shard_base_url=""):
+    """
+    Gzipped XML for "index", "static" or a company shard name, or None
+    for an unknown section. shard_base_url is where the index says the
+    shards live.
+    """
+    key = f"sitemap:{_version()}:{section}"
+    if section == "index":
+        key += f":{shard_base_url}"
+    body = cache.get(key)
+    if body is not None:
+        return body
+
+    if section == "index":
+        body = _gzip(_render_index(shard_layout(), shard_base_url))
+    elif section == "static":
+        body = _gzip(_render_urlset(_static_entries()))
+    else:
+        shard = next((s for s in shard_layout() if s[0] == section), None)
+        if shard is None:
+            return None
+        body = _gzip(_render_urlset(_company_entries(shard[1], shard[2])))
+
+    cache.set(key, body, None)
+    return body
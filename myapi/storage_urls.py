@@ -0,0 +1,68 @@
+"""
+Direct-to-storage URLs for report PDFs, so download_report can answer with
+a redirect instead of proxying the bytes.
+"""
+from datetime import timedelta
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+
+
+def _firebase_blob_path(pdf_url, bucket_name):
+    parts = urlsplit(pdf_url)
+
+    if parts.scheme == "gs":
+        bucket, path = parts.netloc, parts.path.lstrip("/")
+    elif parts.netloc == "firebasestorage.googleapis.com":
+        # /v0/b/<bucket>/o/<url-encoded path>
+        segments = parts.path.split("/")
+        if len(segments) < 6 or segments[1:3] != ["v0", "b"] or segments[4] != "o":
+            return None
+        bucket, path = segments[3], unquote("/".join(segments[5:]))
+    elif parts.netloc == "storage.googleapis.com":
+        bucket, _, path = parts.path.lstrip("/").partition("/")
+        path = unquote(path)
+    else:
+        return None
+
+    if bucket != bucket_name or not path:
+        return None
+    return path
+
+
+def _cloudinary_url(pdf_url, mode, filename):
+    parts = urlsplit(pdf_url)
+    if parts.netloc != "res.cloudinary.com":
+        return None
+
+    if mode != "download":
+        return pdf_url
+
+    # Only image-type assets accept the fl_attachment flag; raw uploads
+    # cannot be forced to download, so those fall back to proxying.
+    if "/image/upload/" not in parts.path:
+        return None
+    stem = filename.rsplit(".", 1)[0]
+    return pdf_url.replace("/image/upload/", f"/image/upload/fl_attachment:{stem}/", 1)
+
+
+def signed_report_url(pdf_url, mode, filename):
+    """
+    Short-lived URL the client can fetch the PDF from directly, with the
+    same Content-Disposition download_report would send, or None when the
+    store cannot honour it and the PDF has to be proxied.
+    """
+    bucket = getattr(settings, "FIREBASE_BUCKET", None)
+    if bucket is not None:
+        path = _firebase_blob_path(pdf_url, bucket.name)
+        if path:
+            disposition = "attachment" if mode == "download" else "inline"
+            return bucket.blob(path).generate_signed_url(
+                version="v4",
+                expiration=timedelta(seconds=settings.REPORT_SIGNED_URL_SECONDS),
+                method="GET",
+                response_disposition=f'{disposition}; filename="{filename}"',
+                response_type="application/pdf",
+            )
+
+    return _cloudinary_url(pdf_url, mode, filename)
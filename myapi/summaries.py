@@ -0,0 +1,81 @@
+"""
+Per-company report summary stored on CompName: report count, first and
+latest report year, and the thumbnail of the latest report.
+
+Reports belong to a company when their normalized ticker and exchange
+(ticker_norm / exchange_norm) match, the same rule AllReportsOfCompany uses.
+"""
+from django.db.models import Count, Max, Min
+
+from .models import normalize_key
+
+SUMMARY_FIELDS = ["report_count", "first_report_year", "latest_report_year", "latest_thumbnail_url"]
+
+
+def refresh_company_summary(CompName, Report, ticker, exchange):
+    key = {"ticker_norm": normalize_key(ticker), "exchange_norm": normalize_key(exchange)}
+    reports = Report.objects.filter(**key)
+    stats = reports.aggregate(count=Count("id"), first=Min("year"), latest=Max("year"))
+    latest_thumbnail = (
+        reports.exclude(thumbnail_url__isnull=True)
+        .exclude(thumbnail_url="")
+        .order_by("-year")
+        .values_list("thumbnail_url", flat=True)
+        .first()
+    )
+
+    # update() skips save signals, so this cannot loop back into the hooks
+    CompName.objects.filter(**key).update(
+        report_count=stats["count"],
+        first_report_year=stats["first"],
+        latest_report_year=stats["latest"],
+        latest_thumbnail_url=latest_thumbnail,
+    )
+
+
+def rebuild_all(CompName, Report, batch_size=1000):
+    """
+    Recompute every company's summary with two grouped passes over Report.
+    Takes the model classes so data migrations can pass historical models.
+    Returns the number of companies updated.
+    """
+    stats = {}
+    grouped = (
+        Report.objects.values("ticker_norm", "exchange_norm")
+        .annotate(count=Count("id"), first=Min("year"), latest=Max("year"))
+        .order_by()
+    )
+    for row in grouped:
+        stats[(row["ticker_norm"], row["exchange_norm"])] = row
+
+    thumbnails = {}
+    newest_first = (
+        Report.objects.exclude(thumbnail_url__isnull=True)
+        .exclude(thumbnail_url="")
+        .order_by("-year")
+        .values_list("ticker_norm", "exchange_norm", "thumbnail_url")
+    )
+    for t, e, url in newest_first.iterator(chunk_size=5000):
+        thumbnails.setdefault((t, e), url)
+
+    updated = 0
+    batch = []
+    companies = CompName.objects.only("id", "ticker_norm", "exchange_norm", *SUMMARY_FIELDS)
+    for comp in companies.iterator(chunk_size=batch_size):
+        key = (comp.ticker_norm, comp.exchange_norm)
+        row = stats.get(key, {})
+        comp.report_count = row.get("count", 0)
+        comp.first_report_year = row.get("first")
+        comp.latest_report_year = row.get("latest")
+        comp.latest_thumbnail_url = thumbnails.get(key)
+        batch.append(comp)
+
+        if len(batch) >= batch_size:
+            CompName.objects.bulk_update(batch, SUMMARY_FIELDS)
+            updated += len(batch)
+            batch = []
+
+    if batch:
+        CompName.objects.bulk_update(batch, SUMMARY_FIELDS)
+        updated += len(batch)
+    return updated
@@ -0,0 +1,144 @@
+"""
+First-page thumbnails of report PDFs.
+
+The upload code used to rasterize page 1 from in-memory bytes at poppler's
+default 200 dpi (a ~1700x2200 bitmap for A4) and then squash it to a fixed
+300x400. render() instead has pdftoppm rasterize the page from its file
+straight at the widest requested width (-scale-to-x, aspect kept), derives
+the narrower widths from that bitmap and encodes each as JPEG and WebP.
+render_many() spreads a batch of PDFs over a process pool.
+
+Only one variant per report is kept: Report.thumbnail_url has room for a
+single URL, so backfill_thumbnails renders just primary_options() and
+store() uploads that thumbnail to the durable media store (myapi.media_store,
+like moved company logos) as report_thumbnails/<sha256>.<ext>.
+"""
+import hashlib
+import os
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from io import BytesIO
+
+from django.conf import settings
+from pdf2image import convert_from_path
+from PIL import Image
+
+from . import media_store
+
+# format -> (file extension, content type)
+FORMATS = {
+    "jpeg": ("jpg", "image/jpeg"),
+    "webp": ("webp", "image/webp"),
+}
+
+# Media store folder, the one the upload code used on Cloudinary
+FOLDER = "report_thumbnails"
+
+Thumbnail = namedtuple("Thumbnail", "width height format data")
+
+
+class ThumbnailError(Exception):
+    pass
+
+
+def options():
+    """render() keyword arguments from settings, resolved once in the parent."""
+    return {
+        "widths": settings.THUMBNAIL_WIDTHS,
+        "formats": settings.THUMBNAIL_FORMATS,
+        "quality": settings.THUMBNAIL_QUALITY,
+        "timeout": settings.THUMBNAIL_RENDER_TIMEOUT,
+    }
+
+
+def primary_options():
+    """options() narrowed to the variant stored per report: first width, first format."""
+    return dict(options(), widths=settings.THUMBNAIL_WIDTHS[:1], formats=settings.THUMBNAIL_FORMATS[:1])
+
+
+def _encode(image, fmt, quality):
+    buffer = BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def render(path, widths, formats=("jpeg", "webp"), quality=80, timeout=60):
+    """Thumbnails of page 1 of the PDF at path, one per (width, format), widest first."""
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        raise ValueError(f"Unsupported thumbnail formats: {', '.join(sorted(unknown))}")
+    widths = sorted({int(width) for width in widths}, reverse=True)
+    if not widths or widths[-1] < 1:
+        raise ValueError("Thumbnail widths must be positive integers.")
+
+    try:
+        pages = convert_from_path(
+            path, first_page=1, last_page=1, size=(widths[0], None),
+            single_file=True, thread_count=1, timeout=timeout,
+        )
+    except Exception as exc:
+        raise ThumbnailError(f"Could not render {os.path.basename(path)}: {exc}") from exc
+    if not pages:
+        raise ThumbnailError(f"{os.path.basename(path)} has no pages")
+
+    page = pages[0].convert("RGB")
+    thumbnails = []
+    for width in widths:
+        if width == page.width:
+            image = page
+        else:
+            height = max(1, round(page.height * width / page.width))
+            image = page.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            thumbnails.append(Thumbnail(image.width, image.height, fmt, _encode(image, fmt, quality)))
+    return thumbnails
+
+
+def _render_job(key, path, render_options):
+    # Runs in a pool worker; errors travel back as values so one bad PDF
+    # does not end the batch
+    try:
+        return key, render(path, **render_options), None
+    except Exception as exc:
+        return key, None, f"{type(exc).__name__}: {exc}"
+
+
+def render_many(jobs, workers=None, render_options=None):
+    """
+    Render (key, path) jobs, yielding (key, thumbnails, error) as each
+    finishes. jobs may be a lazy iterable: at most two jobs per worker are
+    in flight, so a slow producer (downloads) and the pool overlap without
+    queueing the whole batch. workers=1 renders in-process.
+    """
+    workers = workers or settings.THUMBNAIL_WORKERS
+    render_options = render_options or options()
+
+    if workers <= 1:
+        for key, path in jobs:
+            yield _render_job(key, path, render_options)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for key, path in jobs:
+            pending.add(pool.submit(_render_job, key, path, render_options))
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def store(thumbnail):
+    """
+    Upload one thumbnail under the hash of its bytes and return its
+    absolute URL. Raises media_store.StoreUnavailable when there is nowhere
+    durable to put it.
+    """
+    ext, content_type = FORMATS[thumbnail.format]
+    name = f"{FOLDER}/{hashlib.sha256(thumbnail.data).hexdigest()}.{ext}"
+    return media_store.upload(name, thumbnail.data, content_type)
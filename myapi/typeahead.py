@@ -0,0 +1,277 @@
+"""
+In-process prefix index behind /api/typeahead/?q=.
+
+Every company contributes a few case-folded keys: its ticker, its name,
+and its name from each later word on (so "mat" finds "Applied
+Materials"). The keys sit in one sorted list beside the owning company
+ids, so a lookup is two bisects plus a top-k pick, without touching the
+database. Matches rank exact ticker first, then by report_count.
+
+When the "companies" data version moves, only companies whose page
+version was bumped since the last sync are re-read and patched into a
+copy of the index. Writes that skip the signals (bulk updates) leave no
+such trace and trigger a full rebuild, as does TYPEAHEAD_FULL_REBUILD_SECONDS.
+Readers always see a complete snapshot, swapped in with one assignment.
+"""
+import heapq
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import response_cache, versions
+from .background import BackgroundRefresh
+from .models import CompName, DataVersion
+
+# Past this many changed companies a full rebuild is cheaper (and the
+# OR-ed lookup would approach SQLite's expression depth limit)
+INCREMENTAL_LIMIT = 500
+
+# Clock skew tolerated between the workers stamping DataVersion rows
+SYNC_SLACK = timedelta(seconds=60)
+
+RESULT_FIELDS = ("id", "ticker", "name", "exchange", "report_count")
+
+_FIELDS = RESULT_FIELDS + ("ticker_norm", "exchange_norm")
+
+# Sorts after every character a key can contain
+_KEY_END = "\U0010ffff"
+
+# Key ranges wider than sqrt(WALK_FACTOR * k * companies) are answered by
+# walking companies in popularity order instead of ranking the range; the
+# factor is the measured cost ratio of one walk step to one comparison.
+WALK_FACTOR = 100
+
+
+def normalize(text):
+    return " ".join((text or "").casefold().split())
+
+
+def _keys(row):
+    keys = set()
+    ticker = normalize(row["ticker"])
+    if ticker:
+        keys.add(ticker)
+    words = normalize(row["name"]).split()
+    for i in range(len(words)):
+        keys.add(" ".join(words[i:]))
+    return tuple(sorted(keys))
+
+
+class Snapshot:
+    def __init__(self):
+        self.rows = {}            # id -> row
+        self.company_keys = {}    # id -> its index keys
+        self.by_company = {}      # (ticker_norm, exchange_norm) -> frozenset of ids
+        self.tickers = {}         # normalized ticker -> tuple of ids
+        self.keys = []            # sorted index keys ...
+        self.key_ranks = []       # ... and (-report_count, id) of each key's company
+        self.by_popularity = []   # sorted (-report_count, id)
+
+    @classmethod
+    def build(cls, rows):
+        snapshot = cls()
+        pairs = []
+        for row in rows:
+            snapshot._add_row(row)
+            rank = (-row["report_count"], row["id"])
+            pairs.extend((key, rank) for key in snapshot.company_keys[row["id"]])
+        pairs.sort()
+        snapshot.keys = [key for key, _ in pairs]
+        snapshot.key_ranks = [rank for _, rank in pairs]
+        snapshot.by_popularity = sorted(set(snapshot.key_ranks))
+        return snapshot
+
+    def copy(self):
+        snapshot = Snapshot()
+        snapshot.rows = dict(self.rows)
+        snapshot.company_keys = dict(self.company_keys)
+        snapshot.by_company = dict(self.by_company)
+        snapshot.tickers = dict(self.tickers)
+        snapshot.keys = list(self.keys)
+        snapshot.key_ranks = list(self.key_ranks)
+        snapshot.by_popularity = list(self.by_popularity)
+        return snapshot
+
+    def _add_row(self, row):
+        cid = row["id"]
+        company = (row["ticker_norm"], row["exchange_norm"])
+        ticker = normalize(row["ticker"])
+        self.rows[cid] = row
+        self.company_keys[cid] = _keys(row)
+        self.by_company[company] = self.by_company.get(company, frozenset()) | {cid}
+        self.tickers[ticker] = self.tickers.get(ticker, ()) + (cid,)
+
+    # Incremental updates; only ever applied to a copy() that is not live yet
+
+    def add(self, row):
+        self._add_row(row)
+        rank = (-row["report_count"], row["id"])
+        for key in self.company_keys[row["id"]]:
+            # same order as build(): by key, then rank
+            i = bisect_left(self.keys, key)
+            while i < len(self.keys) and self.keys[i] == key and self.key_ranks[i] < rank:
+                i += 1
+            self.keys.insert(i, key)
+            self.key_ranks.insert(i, rank)
+        self.by_popularity.insert(bisect_left(self.by_popularity, rank), rank)
+
+    def remove(self, cid):
+        row = self.rows.pop(cid)
+        for key in self.company_keys.pop(cid):
+            i = bisect_left(self.keys, key)
+            while self.key_ranks[i][1] != cid:
+                i += 1
+            del self.keys[i]
+            del self.key_ranks[i]
+        del self.by_popularity[bisect_left(self.by_popularity, (-row["report_count"], cid))]
+
+        company = (row["ticker_norm"], row["exchange_norm"])
+        ticker = normalize(row["ticker"])
+        self.by_company[company] = self.by_company[company] - {cid}
+        if not self.by_company[company]:
+            del self.by_company[company]
+        self.tickers[ticker] = tuple(x for x in self.tickers[ticker] if x != cid)
+        if not self.tickers[ticker]:
+            del self.tickers[ticker]
+
+    def _rank(self, cid):
+        return (-self.rows[cid]["report_count"], cid)
+
+    def complete(self, query, k):
+        prefix = normalize(query)
+        if not prefix or k < 1:
+            return []
+
+        picked = sorted(self.tickers.get(prefix, ()), key=self._rank)[:k]
+        need = k - len(picked)
+
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + _KEY_END, lo)
+        if need > 0 and hi > lo:
+            seen = set(picked)
+            if (hi - lo) ** 2 > WALK_FACTOR * need * len(self.rows):
+                # Very common prefix: walking companies by popularity finds
+                # k matches sooner than ranking the whole key range.
+                for _, cid in self.by_popularity:
+                    if cid not in seen and any(key.startswith(prefix) for key in self.company_keys[cid]):
+                        picked.append(cid)
+                        if len(picked) == k:
+                            break
+            else:
+                # A company can own several matching keys (ticker "AAP",
+                # name "Aap Industries"), so take a few extra and dedupe.
+                ranks = self.key_ranks[lo:hi]
+                best = heapq.nsmallest(need * 2, ranks)
+                if len(best) == need * 2 and len({cid for _, cid in best} - seen) < need:
+                    best = sorted(set(ranks))
+                for _, cid in best:
+                    if cid not in seen:
+                        seen.add(cid)
+                        picked.append(cid)
+                        if len(picked) == k:
+                            break
+
+        return [{field: self.rows[cid][field] for field in RESULT_FIELDS} for cid in picked]
+
+
+class TypeaheadIndex(BackgroundRefresh):
+    def __init__(self, full_rebuild_interval):
+        super().__init__()
+        self.full_rebuild_interval = full_rebuild_interval
+        self.snapshot = None
+        self.version = None
+        self.synced_at = None
+        self.built_at = 0.0
+        self.metrics.update({
+            "lookups": 0, "full_builds": 0, "incremental_updates": 0, "last_refresh_seconds": 0.0,
+        })
+
+    def _changed_companies(self):
+        scopes = (
+            DataVersion.objects.filter(scope__startswith="company:", updated_at__gte=self.synced_at - SYNC_SLACK)
+            .values_list("scope", flat=True)[:INCREMENTAL_LIMIT + 1]
+        )
+        return {company for company in map(response_cache.company_from_scope, scopes) if company}
+
+    def _patch(self, changed):
+        match = Q()
+        for ticker_norm, exchange_norm in changed:
+            match |= Q(ticker_norm=ticker_norm, exchange_norm=exchange_norm)
+        rows = list(CompName.objects.filter(match).values(*_FIELDS))
+
+        snapshot = self.snapshot.copy()
+        stale = set()
+        for company in changed:
+            stale |= snapshot.by_company.get(company, frozenset())
+        # a re-keyed company may still sit under a key that was not bumped
+        stale |= {row["id"] for row in rows if row["id"] in snapshot.rows}
+        for cid in stale:
+            snapshot.remove(cid)
+        for row in rows:
+            snapshot.add(row)
+
+        return snapshot
+
+    def refresh(self):
+        started = time.monotonic()
+        # Version first: the per-company bumps of a write commit before its
+        # "companies" bump, so every change this version covers is visible.
+        version = versions.get_version("companies")
+        synced_at = timezone.now()
+
+        full = self.snapshot is None or started - self.built_at > self.full_rebuild_interval
+        changed = None if full else self._changed_companies()
+        if full or not changed or len(changed) > INCREMENTAL_LIMIT:
+            snapshot = Snapshot.build(CompName.objects.values(*_FIELDS).iterator(chunk_size=5000))
+            kind = "full_builds"
+        else:
+            snapshot = self._patch(changed)
+            kind = "incremental_updates"
+
+        with self._lock:
+            self.snapshot = snapshot
+            self.version = version
+            self.synced_at = synced_at
+            if kind == "full_builds":
+                self.built_at = started
+            self.metrics[kind] += 1
+            self.metrics["last_refresh_seconds"] = round(time.monotonic() - started, 4)
+
+    def is_empty(self):
+        return self.snapshot is None
+
+    def is_stale(self):
+        if time.monotonic() - self.built_at > self.full_rebuild_interval:
+            return True
+        return self.version != versions.get_version("companies")
+
+    def complete(self, query, k):
+        self.ensure_fresh()
+        with self._lock:
+            self.metrics["lookups"] += 1
+        return self.snapshot.complete(query, k)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self.metrics)
+        snapshot = self.snapshot
+        data.update({
+            "companies": len(snapshot.rows) if snapshot else 0,
+            "keys": len(snapshot.keys) if snapshot else 0,
+            "age_seconds": round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+        })
+        return data
+
+
+_index = None
+
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = TypeaheadIndex(settings.TYPEAHEAD_FULL_REBUILD_SECONDS)
+    return _index
@@ -10,6 +10,8 @@ from .views import (
     # auto_upload_pdf_from_url
 )
 from . import views
+from .async_views import download_report_async
+from django.conf import settings
 from django.http import HttpResponse
 
 def home(request):
@@ -23,10 +25,21 @@ urlpatterns = [
     path('ping/', views.ping),
 
     path('sitemap.xml', views.sitemap),
+    path('sitemap-<str:section>.xml', views.sitemap_section),
 
     # Companies API
     path('api/companies/', CompanyList.as_view(), name='company-list'),
 
+    # Full-text company search
+    path('api/search/', views.CompanySearch.as_view(), name='company-search'),
+
+    # Sector -> industry -> company counts, and companies per sector
+    path('api/sectors/', views.SectorList.as_view(), name='sector-list'),
+    path('api/sectors/<path:sector>/companies/', views.SectorCompanies.as_view(), name='sector-companies'),
+
+    # Prefix completion for the search box
+    path('api/typeahead/', views.CompanyTypeahead.as_view(), name='company-typeahead'),
+
     # List all reports
     path('api/reports/', ReportList.as_view(), name='report-list'),
 
@@ -39,8 +52,23 @@ urlpatterns = [
     # All reports of a company
     path('company-reports/<str:ticker>/<str:exchange>/', AllReportsOfCompany.as_view()),
     
-    path("download-report/<int:report_id>/", download_report),
-    
+    # Non-blocking under backend/asgi.py; a WSGI server would buffer the async body
+    path(
+        "download-report/<int:report_id>/",
+        download_report_async if settings.RUNNING_ASGI else download_report,
+    ),
+
+    # One page as JPEG, rendered from the cached PDF (?w=<width>)
+    path("report/<int:report_id>/page/<int:page>.jpg", views.report_page),
+
+    path("api/pdf-cache/stats/", views.pdf_cache_stats),
+
+    path("api/page-renders/stats/", views.page_render_stats),
+
+    path("api/featured-pool/stats/", views.featured_pool_stats),
+
+    path("api/typeahead/stats/", views.typeahead_stats),
+
     path('random-logos/', RandomSixCompanies.as_view(), name='random-logos'),
     
     # path("upload-pdf/", views.upload_pdf, name="upload_pdf"),
@@ -0,0 +1,69 @@
+"""
+Data version counters used to key caches and ETags derived from the database.
+
+Each scope ("companies", "reports", one company's page) is a DataVersion
+row bumped by the write hooks in myapi.signals once the write has
+committed, so versions only ever go up and every worker agrees on them.
+Reads go through Django's cache: checking a version costs no query while
+the cached copy is fresh, and a per-worker cache sees another worker's
+write within DATA_VERSION_CACHE_SECONDS.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+
+def _key(scope):
+    return f"data-version-state:{scope}"
+
+
+def _load(scopes):
+    # (version, unix time of the last bump); never-written scopes are (0, 0)
+    state = {scope: (0, 0) for scope in scopes}
+    for scope, version, updated_at in DataVersion.objects.filter(scope__in=scopes).values_list(
+        "scope", "version", "updated_at"
+    ):
+        state[scope] = (version, int(updated_at.timestamp()))
+
+    cache.set_many({_key(scope): value for scope, value in state.items()}, settings.DATA_VERSION_CACHE_SECONDS)
+    return state
+
+
+def get_state(*scopes):
+    """[(version, last modified timestamp)] for each scope, in order."""
+    cached = cache.get_many([_key(scope) for scope in scopes])
+    state = {scope: cached[_key(scope)] for scope in scopes if _key(scope) in cached}
+
+    missing = [scope for scope in scopes if scope not in state]
+    if missing:
+        state.update(_load(missing))
+    return [state[scope] for scope in scopes]
+
+
+def get_version(scope):
+    return get_state(scope)[0][0]
+
+
+def _bump(scope):
+    now = timezone.now()
+    rows = DataVersion.objects.filter(scope=scope)
+    if not rows.update(version=F("version") + 1, updated_at=now):
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(scope=scope, version=1, updated_at=now)
+        except IntegrityError:
+            # another worker created it first
+            rows.update(version=F("version") + 1, updated_at=now)
+    _load([scope])
+
+
+def bump(scope):
+    # After commit, so nobody rebuilds a cache entry for the new version
+    # from data that is not visible yet.
+    transaction.on_commit(partial(_bump, scope))
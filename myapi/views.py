@@ -1,219 +1,582 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Report, CompName, CompInfo
+from .models import Report, CompName, CompInfo, normalize_key
 from django.http import FileResponse, Http404
 from django.conf import settings
 from pdf2image import convert_from_bytes
 from io import BytesIO
-from .serializers import ReportSerializer 
-from django.db.models.functions import Trim
+from .serializers import REPORT_FIELDS, absolute_url_builder, report_rows
+from .pagination import CompanyCursorPagination, ReportCursorPagination
+from rest_framework.exceptions import ValidationError
 from django.db import transaction
 from django.http import HttpResponse
 # import cloudinary.uploader
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+import gzip
+from django.utils.decorators import method_decorator
+from rest_framework.utils.urls import replace_query_param
+from . import featured, payload_cache, response_cache, search, sectors, sitemaps, typeahead
+from .conditional import versioned
 
 def ping(request):
     return HttpResponse("OK")
     
+def _sitemap_response(request, body):
+    response = HttpResponse(content_type="application/xml")
+    if payload_cache.accepts_gzip(request):
+        response["Content-Encoding"] = "gzip"
+    else:
+        body = gzip.decompress(body)
+    response.content = body
+    response["Vary"] = "Accept-Encoding"
+    return response
+
+
+@versioned(["companies", "reports"], public=True, max_age=settings.SITEMAP_CACHE_MAX_AGE)
 def sitemap(request):
-    from .models import CompName
+    shard_base_url = settings.SITEMAP_SHARD_BASE_URL or request.build_absolute_uri("/").rstrip("/")
+    return _sitemap_response(request, sitemaps.gzipped_section("index", shard_base_url))
+
+
+@versioned(["companies", "reports"], public=True, max_age=settings.SITEMAP_CACHE_MAX_AGE)
+def sitemap_section(request, section):
+    if not sitemaps.is_section(section):
+        raise Http404("Unknown sitemap")
+    body = sitemaps.gzipped_section(section)
+    if body is None:
+        raise Http404("Unknown sitemap")
+    return _sitemap_response(request, body)
+
+def _int_param(request, name):
+    value = request.GET.get(name, "").strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
 
-    companies = CompName.objects.exclude(
-        ticker__isnull=True,
-        exchange__isnull=True
-    )
 
-    xml = """<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-"""
+@method_decorator(
+    versioned(["reports"], cache_payload=True, public=True, max_age=settings.API_CACHE_MAX_AGE),
+    name="get",
+)
+class ReportList(APIView):
+    def get(self, request):
+        reports = Report.objects.all()
 
-    # Static pages
-    xml += """
-    <url><loc>https://arannualreport.com/</loc></url>
-    <url><loc>https://arannualreport.com/AllCompanies</loc></url>
-    <url><loc>https://arannualreport.com/sectorslist</loc></url>
-    """
+        # Server-side filters: ?exchange= &ticker= &year_min= &year_max=
+        exchange = normalize_key(request.GET.get("exchange"))
+        if exchange:
+            reports = reports.filter(exchange_norm=exchange)
 
-    # Dynamic pages
-    for comp in companies:
-        xml += f"""
-    <url>
-        <loc>https://arannualreport.com/company-reports/{comp.ticker}/{comp.exchange}</loc>
-    </url>
-    """
+        ticker = normalize_key(request.GET.get("ticker"))
+        if ticker:
+            reports = reports.filter(ticker_norm=ticker)
 
-    xml += "</urlset>"
+        year_min = _int_param(request, "year_min")
+        if year_min is not None:
+            reports = reports.filter(year__gte=year_min)
 
-    return HttpResponse(xml, content_type="application/xml")
+        year_max = _int_param(request, "year_max")
+        if year_max is not None:
+            reports = reports.filter(year__lte=year_max)
 
-class ReportList(APIView):
-    def get(self, request):
-        reports = Report.objects.all()
-        serializer = ReportSerializer(reports, many=True, context={'request': request})
-        return Response(serializer.data)
+        paginator = ReportCursorPagination()
+        page = paginator.paginate_queryset(reports.values(*REPORT_FIELDS), request, view=self)
+        return paginator.get_paginated_response(page)
 
 
 class RandomCompanyReport(APIView):
     def get(self, request):
-        companies = CompName.objects.order_by("?")[:6]
+        picks = featured.get_pool().sample(6)
 
-        if not companies:
+        if not picks:
             raise Http404("No companies found")
 
         results = []
  
-        for comp in companies:
-            report = Report.objects.filter(ticker=comp.ticker).order_by("?").first()
-
+        for entry in picks:
+            report = entry["report"]
             results.append({
-                "company": {
-                    "id": comp.id,
-                    "name": comp.name,
-                    "ticker": comp.ticker,
-                    "sector": comp.sector,
-                    "exchange": comp.exchange,
-                },
+                "company": entry["company"],
                 "report": {
-                    "id": report.id if report else None,
-                    "year": report.year if report else None,
+                    "id": report["id"] if report else None,
+                    "year": report["year"] if report else None,
                     "has_report": bool(report),
-                    "report_pdf": report.pdf_url if report else None,
-                    "thumbnail_url": report.thumbnail_url if report else None,  # added thumbnail
+                    "report_pdf": report["pdf_url"] if report else None,
+                    "thumbnail_url": report["thumbnail_url"] if report else None,  # added thumbnail
                 }
             })
 
         return Response({"results": results})
 
 
-class AllReportsOfCompany(APIView):
-    def get(self, request, ticker, exchange):
+def _logo_url_builder(request):
+    build = absolute_url_builder(request)
+
+    def logo_url(logo):
+        if not logo:
+            return logo
+        # Bare relative paths are media file names
+        if not logo.startswith(("http://", "https://", "data:", "/")):
+            logo = settings.MEDIA_URL + logo
+        return build(logo)
+
+    return logo_url
+
+
+def _absolute_logo(request, logo_url):
+    return _logo_url_builder(request)(logo_url)
+
+
+def _company_payload(company):
+    # company comes with select_related("info"); reports are one more query.
+    # The logo is left as stored: the payload is cached across hosts.
+    comp_info = getattr(company, "info", None)
+
+    report_data = report_rows(company.reports.order_by("-year"))
+    report_message = "" if report_data else "No reports available for this company"
+
+    return {
+        "ticker": company.ticker,
+        "company_name": company.name,
+        "exchange": company.exchange,
+        "sector": company.sector,
+        "industry": company.industry,
+        "logo": company.logo,
+        "employee_count": getattr(comp_info, "emp_number", "") if comp_info else "",
+        "address": getattr(comp_info, "address", "") if comp_info else "",
+        "description": getattr(comp_info, "info", "") if comp_info else "",
+        "social_links": {
+            "instagram": getattr(comp_info, "insta_link", "") if comp_info else "",
+            "facebook": getattr(comp_info, "face_link", "") if comp_info else "",
+            "youtube": getattr(comp_info, "youtube_link", "") if comp_info else "",
+            "twitter": getattr(comp_info, "twitter_link", "") if comp_info else "",
+            "website": getattr(comp_info, "web_link", "") if comp_info else "",
+            "linkedin": getattr(comp_info, "linkedin_link", "") if comp_info else "",
+        },
+        "reports": report_data,
+        "report_message": report_message
+    }
+
 
-        # Company MATCH ticker + exchange
-        company = CompName.objects.filter(
-            ticker__iexact=ticker,
-            exchange__iexact=exchange
-        ).values(
-            "name", "ticker", "logo", "exchange", "sector", "industry"
-        ).first()
+def _company_scopes(ticker, exchange):
+    return [response_cache.company_scope(normalize_key(ticker), normalize_key(exchange))]
 
-        if not company:
+
+@method_decorator(
+    versioned(_company_scopes, cache_payload=True, public=True, max_age=settings.API_CACHE_MAX_AGE),
+    name="get",
+)
+class AllReportsOfCompany(APIView):
+    def get(self, request, ticker, exchange):
+        ticker_norm = normalize_key(ticker)
+        exchange_norm = normalize_key(exchange)
+
+        def build():
+            # Company MATCH ticker + exchange, with its info in the same query
+            company = CompName.objects.filter(
+                ticker_norm=ticker_norm,
+                exchange_norm=exchange_norm
+            ).select_related("info").order_by("id").first()
+            return _company_payload(company) if company else None
+
+        payload = response_cache.cached_company_page(ticker_norm, exchange_norm, build)
+        if payload is None:
             raise Http404("Company not found")
 
-        # Optional comp info MATCH both
-        comp_info = CompInfo.objects.filter(
-            ticker__iexact=ticker,
-            exchange__iexact=exchange
-        ).first()
-
-        # Logo handling
-        logo_url = company.get("logo")
-        if logo_url and not logo_url.startswith("http"):
-            logo_url = request.build_absolute_uri(settings.MEDIA_URL + str(logo_url))
-
-        # Reports MATCH ticker + exchange
-        reports = Report.objects.filter(
-            ticker__iexact=ticker,
-            exchange__iexact=exchange
-        ).order_by("-year")
-
-        if reports.exists():
-            report_data = ReportSerializer(reports, many=True, context={'request': request}).data
-            report_message = ""
-        else:
-            report_data = []
-            report_message = "No reports available for this company"
+        return Response(dict(payload, logo=_absolute_logo(request, payload["logo"])))
 
-        return Response({
-            "ticker": company["ticker"],
-            "company_name": company["name"],
-            "exchange": company["exchange"],
-            "sector": company["sector"],
-            "industry": company["industry"],
-            "logo": logo_url,
-            "employee_count": getattr(comp_info, "emp_number", "") if comp_info else "",
-            "address": getattr(comp_info, "address", "") if comp_info else "",
-            "description": getattr(comp_info, "info", "") if comp_info else "",
-            "social_links": {
-                "instagram": getattr(comp_info, "insta_link", "") if comp_info else "",
-                "facebook": getattr(comp_info, "face_link", "") if comp_info else "",
-                "youtube": getattr(comp_info, "youtube_link", "") if comp_info else "",
-                "twitter": getattr(comp_info, "twitter_link", "") if comp_info else "",
-                "website": getattr(comp_info, "web_link", "") if comp_info else "",
-                "linkedin": getattr(comp_info, "linkedin_link", "") if comp_info else "",
-            },
-            "reports": report_data,
-            "report_message": report_message
-        })
 
 
+COMPANY_LIST_FIELDS = (
+    "id", "name", "ticker", "sector", "industry", "exchange", "logo",
+    "report_count", "first_report_year", "latest_report_year", "latest_thumbnail_url",
+)
 
+
+@method_decorator(
+    versioned(["companies"], cache_payload=True, public=True, max_age=settings.API_CACHE_MAX_AGE),
+    name="get",
+)
 class CompanyList(APIView):
     def get(self, request):
-        exchange = request.GET.get("exchange", "").strip()
+        exchange = normalize_key(request.GET.get("exchange"))
         qs = CompName.objects.all()
 
         if exchange:
-            qs = qs.annotate(clean_exchange=Trim('exchange')).filter(clean_exchange__iexact=exchange)
+            qs = qs.filter(exchange_norm=exchange)
+
+        # ?has_reports=true|false, served by the report_count index
+        has_reports = request.GET.get("has_reports", "").strip().lower()
+        if has_reports in ("1", "true", "yes"):
+            qs = qs.filter(report_count__gt=0)
+        elif has_reports in ("0", "false", "no"):
+            qs = qs.filter(report_count=0)
+
+        data = list(qs.values(*COMPANY_LIST_FIELDS))
 
-        data = list(qs.values(
-            "id", "name", "ticker", "sector", "industry", "exchange", "logo"
-        ))
+        logo_url = _logo_url_builder(request)
+        for row in data:
+            row["logo"] = logo_url(row["logo"])
 
         return Response({"companies": data})
 
 
-class CompanyReportView(APIView):
-    def get(self, request, ticker):
-        company = CompName.objects.get(ticker=ticker)
-        reports = company.reports.all().order_by('-year')
+@method_decorator(
+    versioned(
+        ["companies", "search"], cache_payload=True, public=True, max_age=settings.API_CACHE_MAX_AGE
+    ),
+    name="get",
+)
+class CompanySearch(APIView):
+    """
+    /api/search/?q=<terms>&page=<n>&page_size=<n>
 
-        data = {
-            "company_name": company.name,
-            "exchange": company.exchange,
-            "sector": company.sector,
-            "industry": company.industry,
-            "logo": request.build_absolute_uri(company.logo.url) if company.logo else None,
-            "employee_count": company.employee_count,
-            "address": company.address,
-            "description": company.description,
-            "social_links": company.social_links,
+    Companies whose name, ticker, sector, industry or description contain
+    every term (prefix match), best match first; see myapi.search.
+    """
 
-            "reports": ReportSerializer(reports, many=True, context={'request': request}).data
-        }
+    def get(self, request):
+        query = request.GET.get("q", "").strip()
+        if not search.terms(query):
+            raise ValidationError({"q": "Enter at least one word to search for."})
+
+        page = _int_param(request, "page")
+        page = 1 if page is None else page
+        page_size = _int_param(request, "page_size")
+        page_size = settings.API_PAGE_SIZE if page_size is None else min(page_size, settings.API_MAX_PAGE_SIZE)
+        if page < 1 or page_size < 1:
+            raise ValidationError("page and page_size must be positive integers.")
+
+        # one extra id tells whether there is a next page
+        ids = search.search(query, page_size + 1, (page - 1) * page_size)
+        has_next = len(ids) > page_size
+        ids = ids[:page_size]
+
+        rows = {row["id"]: row for row in CompName.objects.filter(id__in=ids).values(*COMPANY_LIST_FIELDS)}
+        logo_url = _logo_url_builder(request)
+        results = []
+        for pk in ids:
+            if pk in rows:
+                row = rows[pk]
+                row["logo"] = logo_url(row["logo"])
+                results.append(row)
+
+        url = request.build_absolute_uri()
+        return Response({
+            "next": replace_query_param(url, "page", page + 1) if has_next else None,
+            "previous": replace_query_param(url, "page", page - 1) if page > 1 else None,
+            "results": results,
+        })
+
+
+@method_decorator(
+    versioned(["sectors"], cache_payload=True, public=True, max_age=settings.API_CACHE_MAX_AGE),
+    name="get",
+)
+class SectorList(APIView):
+    """
+    /api/sectors/
+
+    Sector -> industry -> company counts for the /sectorslist page, from
+    the materialized GROUP BY in myapi.sectors.
+    """
+
+    def get(self, request):
+        return Response(sectors.sector_tree())
+
+
+@method_decorator(
+    versioned(["companies"], cache_payload=True, public=True, max_age=settings.API_CACHE_MAX_AGE),
+    name="get",
+)
+class SectorCompanies(APIView):
+    """
+    /api/sectors/<sector>/companies/?industry=<industry>
+
+    Companies of one sector, keyset-paginated on the (sector, id) index.
+    """
+
+    def get(self, request, sector):
+        companies = CompName.objects.filter(sectors.company_filter(sector, request.GET.get("industry", "")))
+
+        paginator = CompanyCursorPagination()
+        page = paginator.paginate_queryset(companies.values(*COMPANY_LIST_FIELDS), request, view=self)
+
+        logo_url = _logo_url_builder(request)
+        for row in page:
+            row["logo"] = logo_url(row["logo"])
+
+        return paginator.get_paginated_response(page)
+
+
+class CompanyTypeahead(APIView):
+    """
+    /api/typeahead/?q=<prefix>&limit=<n>
+
+    Prefix completion over tickers and company names from the in-memory
+    index in myapi.typeahead: exact ticker first, then most reports.
+    """
+
+    def get(self, request):
+        limit = _int_param(request, "limit")
+        limit = settings.TYPEAHEAD_MAX_RESULTS if limit is None else min(limit, settings.TYPEAHEAD_MAX_RESULTS)
+        results = typeahead.get_index().complete(request.GET.get("q", ""), limit)
+        return Response({"results": results})
 
-        return Response(data)
 
 class RandomSixCompanies(APIView):
     def get(self, request):
-        companies = CompName.objects.order_by("?")[:6]
+        picks = featured.get_pool().sample(6)
 
-        if not companies:
+        if not picks:
             return Response({"companies": []})
 
         results = []
 
-        for comp in companies:
-            logo_url = comp.logo  # take as-is
-
+        for entry in picks:
+            comp = entry["company"]
             # Only prepend MEDIA_URL if logo is a relative path
-            if logo_url and not logo_url.startswith("http"):
-                logo_url = request.build_absolute_uri(settings.MEDIA_URL + str(logo_url))
+            logo_url = _absolute_logo(request, entry["logo"])
 
             results.append({
-                "id": comp.id,
-                "name": comp.name,
-                "ticker": comp.ticker,
-                "exchange": comp.exchange,  # ✅ Added this
+                "id": comp["id"],
+                "name": comp["name"],
+                "ticker": comp["ticker"],
+                "exchange": comp["exchange"],  # ✅ Added this
                 "logo": logo_url
             })
 
         return Response({"companies": results})
 
 
-import requests
+import re
 from django.core.files.temp import NamedTemporaryFile
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from . import http_client, page_renders, pdf_cache, storage_urls
+
+
+def _stream_upstream(upstream, chunk_size):
+    # Relay the upstream body chunk by chunk so a worker never holds more
+    # than one chunk of the PDF in memory, and always release the connection.
+    try:
+        for chunk in upstream.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+    finally:
+        upstream.close()
+
+
+def _report_filename(report):
+    return f"{report.ticker}_{report.year}.pdf"
+
+
+def _set_disposition(response, report, mode):
+    if mode == "download":
+        response["Content-Disposition"] = f'attachment; filename="{_report_filename(report)}"'
+    else:
+        response["Content-Disposition"] = f'inline; filename="{_report_filename(report)}"'
+    return response
+
+
+SINGLE_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def _parse_range(range_header, size):
+    # Single "bytes=a-b" / "bytes=a-" / "bytes=-n" ranges only; anything
+    # else is answered with the whole file, which HTTP allows.
+    match = SINGLE_RANGE.fullmatch(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+
+    start, end = match.groups()
+    if start:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    else:
+        start = max(size - int(end), 0)
+        end = size - 1
+
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _upstream_range_headers(request):
+    """
+    Range / If-Range to forward upstream. Only single ranges go through: a
+    multi-range request would come back as multipart/byteranges, which the
+    relay labels application/pdf, so those get the whole file instead.
+    """
+    range_header = request.headers.get("Range", "").strip()
+    match = SINGLE_RANGE.fullmatch(range_header)
+    if not match or match.groups() == ("", ""):
+        return {}
+
+    headers = {"Range": range_header}
+    if request.headers.get("If-Range"):
+        headers["If-Range"] = request.headers["If-Range"]
+    return headers
+
+
+def _read_file_range(f, start, length, chunk_size):
+    with f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _cached_pdf_response(request, entry, f, report, mode, read_range=None):
+    """
+    Response for a cached PDF. f is the entry's file from PdfCache.open, so
+    eviction cannot pull it away. read_range(f, start, length, chunk_size)
+    produces the body; by default the file is read synchronously, and whole
+    by FileResponse so the server can use sendfile / wsgi.file_wrapper.
+    """
+    byte_range = _parse_range(request.headers.get("Range", ""), entry.size)
+
+    if byte_range is False:
+        f.close()
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{entry.size}"
+    elif byte_range or read_range:
+        start, end = byte_range or (0, entry.size - 1)
+        response = StreamingHttpResponse(
+            (read_range or _read_file_range)(f, start, end - start + 1, settings.REPORT_STREAM_CHUNK_SIZE),
+            content_type="application/pdf"
+        )
+        response["Content-Length"] = str(end - start + 1)
+        if byte_range:
+            response.status_code = 206
+            response["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+    else:
+        response = FileResponse(f, content_type="application/pdf")
+
+    response["Accept-Ranges"] = "bytes"
+    return _set_disposition(response, report, mode)
+
+
+def _serve_cached(request, cache, entry, report, mode, read_range=None):
+    """Response for a cache entry, or None when it was evicted since lookup."""
+    f = cache.open(entry)
+    if f is None:
+        return None
+    cache.count("hits")
+    cache.touch(entry)
+    return _cached_pdf_response(request, entry, f, report, mode, read_range)
+
+
+def _pdf_cache_response(request, report, mode, fetch_upstream, read_range=None, stream=iter):
+    """
+    Response from the local PDF cache, filling it from fetch_upstream first
+    when the copy is missing or stale, or None to proxy the store directly.
+    read_range and stream (applied to an in-flight download) let the async
+    view keep file reads off the event loop.
+    """
+    cache = pdf_cache.get_cache()
+    if not cache.enabled:
+        return None
+
+    cache_key = cache.key_for(report.id, report.pdf_url)
+    entry = cache.lookup(cache_key)
+
+    if entry and not entry.needs_revalidation(cache.revalidate_after):
+        response = _serve_cached(request, cache, entry, report, mode, read_range)
+        if response:
+            return response
+        entry = None
+
+    # Ranges of uncached reports go straight upstream so the first page is
+    # not held up by a full download.
+    if not entry and _upstream_range_headers(request):
+        return None
+
+    try:
+        result = cache.fetch(cache_key, fetch_upstream)
+    except Exception as e:
+        # Store unreachable: a stale copy beats an error page
+        entry = cache.lookup(cache_key)
+        response = entry and _serve_cached(request, cache, entry, report, mode, read_range)
+        if response:
+            return response
+        return HttpResponse(f"Error fetching PDF: {e}", status=500)
+
+    if not isinstance(result, pdf_cache.CacheEntry):
+        cache.count("misses")
+        response = StreamingHttpResponse(stream(result), content_type="application/pdf")
+        response["Accept-Ranges"] = "bytes"
+        if result.size is not None:
+            response["Content-Length"] = str(result.size)
+        return _set_disposition(response, report, mode)
+
+    # None when evicted as soon as it landed: the caller proxies it
+    return _serve_cached(request, cache, result, report, mode, read_range)
+
+
+def _redirect_response(request, report, mode):
+    """
+    302 to a signed storage URL when the request (or REPORT_DELIVERY) asks
+    for redirects and the store can sign one with the right disposition;
+    None means proxy.
+    """
+    delivery = request.GET.get("delivery", settings.REPORT_DELIVERY)
+    if delivery != "redirect":
+        return None
+    try:
+        direct_url = storage_urls.signed_report_url(report.pdf_url, mode, _report_filename(report))
+    except Exception:
+        return None
+    if not direct_url:
+        return None
+
+    response = HttpResponseRedirect(direct_url)
+    response["Cache-Control"] = "private, no-store"
+    return response
+
+
+def _range_not_satisfiable(upstream):
+    response = HttpResponse(status=416)
+    response["Accept-Ranges"] = "bytes"
+    if upstream.headers.get("Content-Range"):
+        response["Content-Range"] = upstream.headers["Content-Range"]
+    return response
+
+
+def _relay_response(upstream, body, report, mode):
+    """Streaming response relaying body, the content of a requests or httpx upstream response."""
+    response = StreamingHttpResponse(body, content_type="application/pdf")
+    response["Accept-Ranges"] = "bytes"
+
+    # Upstream may ignore Range and send the whole file with 200
+    if upstream.status_code == 206:
+        response.status_code = 206
+        response["Content-Range"] = upstream.headers.get("Content-Range", "")
+
+    content_length = upstream.headers.get("Content-Length")
+    if content_length and not upstream.headers.get("Content-Encoding"):
+        response["Content-Length"] = content_length
+
+    return _set_disposition(response, report, mode)
+
+
+def _fetch_upstream(pdf_url, extra_headers):
+    # identity encoding keeps upstream Content-Length valid for the client
+    return http_client.get(
+        pdf_url,
+        headers={"Accept-Encoding": "identity", **extra_headers},
+        stream=True,
+    )
+
+
 def download_report(request, report_id):
     try:
         report = Report.objects.get(id=report_id)
@@ -227,40 +590,105 @@ def download_report(request, report_id):
 
     mode = request.GET.get("mode", "view")
 
+    # Send the client straight to the bucket when the store can sign a URL
+    # with the right disposition; otherwise fall back to proxying.
+    response = _redirect_response(request, report, mode)
+    if response:
+        return response
+
+    response = _pdf_cache_response(request, report, mode, lambda headers: _fetch_upstream(pdf_url, headers))
+    if response:
+        return response
+
     try:
-        pdf_response = requests.get(pdf_url, timeout=60)
+        # Forward byte ranges so PDF.js can load linearized PDFs incrementally
+        pdf_response = _fetch_upstream(pdf_url, _upstream_range_headers(request))
+
+        if pdf_response.status_code == 416:
+            pdf_response.close()
+            return _range_not_satisfiable(pdf_response)
+
         pdf_response.raise_for_status()
     except Exception as e:
         return HttpResponse(f"Error fetching PDF: {e}", status=500)
 
-    response = HttpResponse(
-        pdf_response.content,
-        content_type="application/pdf"
+    return _relay_response(
+        pdf_response, _stream_upstream(pdf_response, settings.REPORT_STREAM_CHUNK_SIZE), report, mode
     )
 
-    if mode == "download":
-        response["Content-Disposition"] = f'attachment; filename="{report.ticker}_{report.year}.pdf"'
-    else:
-        response["Content-Disposition"] = f'inline; filename="{report.ticker}_{report.year}.pdf"'
 
+def report_page(request, report_id, page):
+    """
+    /report/<id>/page/<n>.jpg?w=<px>: one page as JPEG, rendered from the
+    local PDF cache copy (see myapi.page_renders).
+    """
+    width = request.GET.get("w", "").strip()
+    try:
+        width = page_renders.snap_width(int(width) if width else settings.PAGE_RENDER_DEFAULT_WIDTH)
+    except ValueError:
+        return HttpResponse("w must be an integer", status=400)
+    if page < 1:
+        raise Http404("Page not found")
+
+    try:
+        report = Report.objects.get(id=report_id)
+    except Report.DoesNotExist:
+        return HttpResponse("Report not found", status=404)
+    if not report.pdf_url:
+        return HttpResponse("PDF URL missing", status=400)
+
+    renderer = page_renders.get_renderer()
+    key = renderer.key_for(report.id, report.pdf_url, page, width)
+    cached = renderer.lookup(key)
+    if cached:
+        response = FileResponse(cached, content_type="image/jpeg")
+    else:
+        try:
+            data = renderer.render(key, report, page, width)
+        except page_renders.PageNotFound:
+            raise Http404("Page not found")
+        except (page_renders.RendererBusy, TimeoutError):
+            response = HttpResponse("Busy rendering pages, try again shortly", status=503)
+            response["Retry-After"] = "5"
+            return response
+        except Exception as e:
+            return HttpResponse(f"Error rendering page: {e}", status=500)
+        response = HttpResponse(data, content_type="image/jpeg")
+
+    response["Cache-Control"] = f"public, max-age={settings.PAGE_RENDER_MAX_AGE}"
     return response
 
+
+# Per-process cache counters are for operators only
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def page_render_stats(request):
+    return Response(page_renders.get_renderer().stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def pdf_cache_stats(request):
+    return Response(pdf_cache.get_cache().stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def featured_pool_stats(request):
+    return Response(featured.get_pool().stats())
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def typeahead_stats(request):
+    return Response(typeahead.get_index().stats())
+
+
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
 import time
 
 def download_pdf_with_headers(pdf_url):
-    session = requests.Session()
-
-    retries = Retry(
-        total=5,
-        backoff_factor=1,
-        status_forcelist=[403, 429, 500, 502, 503, 504],
-        allowed_methods=["GET"]
-    )
-    session.mount("https://", HTTPAdapter(max_retries=retries))
-
     headers = {
         "User-Agent": (
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -273,7 +701,7 @@ def download_pdf_with_headers(pdf_url):
         "Connection": "keep-alive",
     }
 
-    response = session.get(pdf_url, headers=headers, timeout=60)
+    response = http_client.get(pdf_url, retry="scrape", headers=headers)
     response.raise_for_status()
     return response.content
 
@@ -428,7 +856,7 @@ def download_pdf_with_headers(pdf_url):
 #     # Fetch report page
 #     # -----------------------------
 #     try:
-#         page_response = requests.get(
+#         page_response = http_client.get(
 #             url,
 #             headers={"User-Agent": "Mozilla/5.0"},
 #             timeout=30